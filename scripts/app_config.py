@@ -1,48 +1,53 @@
-""" Configure build targets for an application based on its libraries. """
+""" Configure build targets for applications based on their libraries. """
 
 import json
-from common import PROJECT_DATA_PATH
+from common import get_project, scaffold_file, write_stats
+from launch import create_launch_configs, get_debugger
+from presets import merge_presets, update_user_presets
+
+# Name of the aggregate presets building every application
+ALL_APPS_GROUP = "all-apps"
 
 def app_in_project(app_name: str) -> bool:
     """ Check if the application is in the project """
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-        for app in project['apps']:
-            if app['name'] == app_name:
-                return True
-        return False
+    return get_project().has_app(app_name)
 
 def get_libs(app_name: str) -> list[str]:
-    """ Get the libraries used by the application """
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-    for app in project['apps']:
-        if app['name'] == app_name:
-            return app['libs']
-    return []
-
-def set_build_config_and_packaging(app_name: str, libs: list[str]) -> None:
+    """ Get the libraries used by the application, including the indirect ones """
+    project = get_project()
+    return project.get_lib_closure(project.get_app_libs(app_name))
+
+def get_group_libs(app_names: list[str]) -> list[str]:
+    """ Get the libraries used by any of the applications, each listed once """
+    project = get_project()
+    return project.get_lib_closure([lib for app in app_names for lib in project.get_app_libs(app)])
+
+def get_targets(app_names: list[str]) -> list[str]:
+    """ Get the targets of the applications, building each shared library, test and benchmark once """
+    project = get_project()
+    libs = get_group_libs(app_names)
+    benchs = [f"bench_{lib}" for lib in libs if project.get_lib_data(lib).get("bench")]
+    return [*app_names, *libs, *[f"test_{lib}" for lib in libs], *benchs]
+
+def set_build_config_and_packaging(app_names: list[str], group_name: str | None = None) -> None:
     """ Set the build configuration for the CMakeUserPresets.json file """
-    build_presets = create_build_presets(app_name, libs)
-    package_presets = create_package_presets(app_name)
+    build_presets = create_build_presets(app_names, group_name)
+    package_presets = create_package_presets(app_names, group_name)
 
-    # Write the CMakeUserPresets.json file
-    with open("CMakeUserPresets.json", 'r') as file:
-        cmake_presets = json.load(file)
-    cmake_presets["buildPresets"] = build_presets
-    cmake_presets["packagePresets"] = package_presets
-    with open("CMakeUserPresets.json", 'w') as file:
-        json.dump(cmake_presets, file, indent=4)
+    # Write the CMakeUserPresets.json file, keeping the presets of other targets
+    def add_presets(cmake_presets: dict[str, any]) -> None:
+        cmake_presets["buildPresets"] = merge_presets(cmake_presets.get("buildPresets", []), build_presets)
+        cmake_presets["packagePresets"] = merge_presets(cmake_presets.get("packagePresets", []), package_presets)
+    update_user_presets(add_presets)
 
-    print(f"Build configuration and packaging for '{app_name}' added successfully.")
+    print(f"Build configuration and packaging for '{', '.join(app_names)}' added successfully.")
 
-def create_build_presets(app_name: str, libs: list[str]) -> list[dict[str, any]]:
-    """ Create build presets for the new application """
-    return [
+def create_build_presets(app_names: list[str], group_name: str | None = None) -> list[dict[str, any]]:
+    """ Create build presets for the applications and for their group """
+    build_presets = [
         {
             "name": "common-build",
             "configurePreset": "default-config",
-            "jobs": 6,
             "hidden": True
         },
         {
@@ -70,46 +75,44 @@ def create_build_presets(app_name: str, libs: list[str]) -> list[dict[str, any]]
             "targets": [
                 "docs"
             ]
-        },
+        }
+    ]
+    for app_name in app_names:
+        build_presets += create_target_presets(app_name, get_targets([app_name]))
+    if group_name:
+        build_presets += create_target_presets(group_name, get_targets(app_names))
+    return build_presets
+
+def create_target_presets(name: str, targets: list[str]) -> list[dict[str, any]]:
+    """ Create the release, debug and debinfo build presets of a list of targets """
+    return [
         {
-            "name": f"{app_name}-release-build",
+            "name": f"{name}-release-build",
             "inherits": "release-build",
-            "targets": [
-                app_name,
-                *libs,
-                *[f"test_{lib}" for lib in libs]
-            ]
+            "targets": targets
         },
         {
-            "name": f"{app_name}-debug-build",
+            "name": f"{name}-debug-build",
             "inherits": "debug-build",
-            "targets": [
-                app_name,
-                *libs,
-                *[f"test_{lib}" for lib in libs]
-            ]
+            "targets": targets
         },
         {
-            "name": f"{app_name}-debinfo-build",
+            "name": f"{name}-debinfo-build",
             "inherits": "debinfo-build",
-            "targets": [
-                app_name,
-                *libs,
-                *[f"test_{lib}" for lib in libs]
-            ]
+            "targets": targets
         }
     ]
 
-def create_package_presets(app_name: str) -> list[dict[str, any]]:
-    """ Create package presets for the new application """
-    return [
+def create_package_presets(app_names: list[str], group_name: str | None = None) -> list[dict[str, any]]:
+    """ Create package presets for the applications and for their group """
+    package_presets = [
         {
             "name": "default-package",
             "description": "default-package",
             "displayName": "default-package",
             "configurePreset": "default-config",
             "generators": [
-                "TGZ"
+                "TZST"
             ],
             "output": {
                 "debug": False,
@@ -117,83 +120,50 @@ def create_package_presets(app_name: str) -> list[dict[str, any]]:
             },
             "packageDirectory": "../install/",
             "hidden": True
-        },
-        {
-            "name": f"{app_name}-package",
+        }
+    ]
+    for name in [*app_names, *([group_name] if group_name else [])]:
+        package_presets.append({
+            "name": f"{name}-package",
             "inherits": "default-package",
             "configurations": [
-                f"{app_name}-release-build"
+                f"{name}-release-build"
             ]
-        }
-    ]
+        })
+    return package_presets
 
-def set_launch_config(app_name: str, libs: list[str]) -> None:
+def set_launch_config(app_names: list[str]) -> None:
     """ Set the launch configuration for the launch.vs.json file """
     data = {
         "configurations": [],
     }
     # Set the new launch configurations
-    data["configurations"].append(
-        {
-            "name": f"Release {app_name}",
-            "type": "cppvsdbg",
-            "request": "launch",
-            "program": f"${{workspaceFolder}}/out/build/apps/{app_name}/Release/{app_name}.exe",
-            "args": [],
-            "stopAtEntry": False,
-            "cwd": "${workspaceFolder}",
-            "environment": [],
-            "console": "internalConsole"
-        }
-    )
-    data["configurations"].append(
-        {
-            "name": f"Debug {app_name}",
-            "type": "cppvsdbg",
-            "request": "launch",
-            "program": f"${{workspaceFolder}}/out/build/apps/{app_name}/Debug/{app_name}.exe",
-            "args": [],
-            "stopAtEntry": False,
-            "cwd": "${workspaceFolder}",
-            "environment": [],
-            "console": "internalConsole"
-        }
-    )
-    for lib in libs:
-        data["configurations"].append({
-            "name": f"Release {lib}",
-            "type": "cppvsdbg",
-            "request": "launch",
-            "program": f"${{workspaceFolder}}/out/build/tests/{lib}/Release/test_{lib}.exe",
-            "args": [],
-            "stopAtEntry": False,
-            "cwd": "${workspaceFolder}",
-            "environment": [],
-            "console": "internalConsole"
-        })
-        data["configurations"].append({
-            "name": f"Debug {lib}",
-            "type": "cppvsdbg",
-            "request": "launch",
-            "program": f"${{workspaceFolder}}/out/build/tests/{lib}/Debug/test_{lib}.exe",
-            "args": [],
-            "stopAtEntry": False,
-            "cwd": "${workspaceFolder}",
-            "environment": [],
-            "console": "internalConsole"
-        })
+    debugger = get_debugger()
+    for app_name in app_names:
+        data["configurations"].extend(create_launch_configs(app_name, f"apps/{app_name}", app_name, debugger))
+    for lib in get_group_libs(app_names):
+        data["configurations"].extend(create_launch_configs(lib, f"tests/{lib}", f"test_{lib}", debugger))
 
     # Write the updated launch.json file
-    with open(".vscode/launch.json", 'w') as file:
+    with scaffold_file(".vscode/launch.json") as file:
         json.dump(data, file, indent=4)
 
-    print(f"Launch configuration for '{app_name}' added successfully.")
+    print(f"Launch configuration for '{', '.join(app_names)}' added successfully.")
 
 if __name__ == "__main__":
-    app_name = input("Enter the name of the application: ")
-    if app_in_project(app_name):
-        libs = get_libs(app_name)
-        set_build_config_and_packaging(app_name, libs)
-        set_launch_config(app_name, libs)
+    app_names = input("Enter the names of the applications (space separated, empty for all): ").split()
+    group_name = None
+    if not app_names:
+        app_names = get_project().apps
+        group_name = ALL_APPS_GROUP
+    elif len(app_names) > 1:
+        group_name = input("Enter the name of this group of applications: ")
+    missing = [app_name for app_name in app_names if not app_in_project(app_name)]
+    if missing:
+        print(f"Application '{missing[0]}' is not in the project.")
+    elif not app_names:
+        print("There are no applications in the project.")
     else:
-        print(f"Application '{app_name}' is not in the project.")
+        set_build_config_and_packaging(app_names, group_name)
+        set_launch_config(app_names)
+        print(write_stats.summary())
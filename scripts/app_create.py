@@ -1,48 +1,63 @@
 """Create the structure of a new app in the project."""
 import os
-import json
-from common import PROJECT_DATA_PATH
+from common import ask_build_options, get_project, scaffold_file, write_build_options, write_stats
+from packages import update_vcpkg_manifest, write_package_links
 
 def lib_in_project(lib_name: str) -> bool:
     """Check if a library is in the project."""
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project_data = json.load(file)
-    return lib_name in project_data["libs"]
+    return get_project().has_lib(lib_name)
 
-def create_app_structure(app_name: str, libs: list[str]) -> None:
+def create_app_structure(app_name: str, libs: list[str], data: dict[str, any] | None = None) -> None:
     """Create the structure of a new app in the project."""
+    write_app_files(app_name, libs, data)
+    # Add the app to json/project_data.json
+    project = get_project()
+    project.add_app(app_name, libs, data)
+    project.save()
+    update_vcpkg_manifest(project)
+
+def write_app_files(app_name: str, libs: list[str], data: dict[str, any] | None = None) -> None:
+    """Write the CMake files of an app, and its source when it is missing."""
     # Define the directory structure
     _dir = f"apps/{app_name}"
     os.makedirs(_dir, exist_ok=True)
     # Create base file
     base_files = f"apps/{app_name}/{app_name}.cpp"
-    with open(base_files, 'w') as file:
-        for lib in libs:
-            file.write(f'#include "{lib}/{lib}.h"\n')
-        file.write('\nint main()\n{\n')
-        file.write('    // App code here\n')
-        file.write('    return 0;\n')
-        file.write('}\n')
+    # An existing source is the user's code, only its CMake files follow the settings
+    if not os.path.exists(base_files):
+        with scaffold_file(base_files) as file:
+            for lib in libs:
+                file.write(f'#include "{lib}/{lib}.h"\n')
+            file.write('\nint main()\n{\n')
+            file.write('    // App code here\n')
+            file.write('    return 0;\n')
+            file.write('}\n')
+    write_app_cmake_files(app_name, libs, data)
+
+def write_app_cmake_files(app_name: str, libs: list[str], data: dict[str, any] | None = None) -> None:
+    """Write the CMake file and precompiled header of an app from its settings."""
+    data = data or {}
     # CMakelists.txt
-    with open(f"apps/{app_name}/CMakeLists.txt", 'w') as file:
+    with scaffold_file(f"apps/{app_name}/CMakeLists.txt") as file:
         file.write('AUX_SOURCE_DIRECTORY(. DIR_LIB_SRCS)\n')
         file.write(f'add_executable({app_name} ${{DIR_LIB_SRCS}})\n')
         file.write(f'install(TARGETS {app_name} RUNTIME DESTINATION bin COMPONENT {app_name}_apps)\n\n')
         file.write(f'target_compile_features({app_name} PRIVATE cxx_std_17)\n\n')
         libs_string = ' '.join(libs)
         file.write(f'target_link_libraries({app_name} PRIVATE {libs_string})\n')
-    # Add the app to json/project_data.json
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project_data = json.load(file)
-        project_data["app_count"] += 1
-        app_data = {
-            "name": app_name,
-            "lib_count": len(libs) - 1,
-            "libs": libs
-        }
-        project_data["apps"].append(app_data)
-    with open(PROJECT_DATA_PATH, 'w') as file:
-        json.dump(project_data, file, indent=4)
+        if data.get("packages") or data.get("unity_build") or data.get("pch"):
+            file.write('\n')
+            write_package_links(file, app_name, data.get("packages", []), "PRIVATE")
+            write_build_options(file, app_name, data)
+        if data.get("ipo"):
+            file.write('\n')
+            file.write(f'project_enable_ipo({app_name})\n')
+    # Precompiled header, parsed once instead of once per source
+    if data.get("pch"):
+        with scaffold_file(f"apps/{app_name}/pch.h") as file:
+            file.write('#pragma once\n\n')
+            for lib in libs:
+                file.write(f'#include "{lib}/{lib}.h"\n')
 
 if __name__ == "__main__":
     app_name = input("Enter the name of the app: ")
@@ -55,4 +70,11 @@ if __name__ == "__main__":
         if not lib_in_project(lib):
             print(f"Library '{lib}' not found in the project. Please create the library first.")
             exit()
-    create_app_structure(app_name, libs)
+    packages = input("Enter the vcpkg packages it uses (space separated, empty for none): ").split()
+    data = ask_build_options()
+    if packages:
+        data["packages"] = packages
+    if input("Enable link-time optimization (IPO) in Release? (y/n): ").strip().lower() == 'y':
+        data["ipo"] = True
+    create_app_structure(app_name, libs, data)
+    print(write_stats.summary())
@@ -1,31 +1,33 @@
 """ Delete an existing application. """
-import json
+import os
 import shutil
-from common import PROJECT_DATA_PATH
+from common import get_project
+from packages import update_vcpkg_manifest
 
 def app_in_project(app_name: str) -> bool:
     """ Check if an application is in the project """
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-    return any(app['name'] == app_name for app in project['apps'])
+    return get_project().has_app(app_name)
 
 def delete_app_from_project(app_name: str) -> None:
     """ Delete the directory structure for a library """
+    remove_app_files(app_name)
+
+    # Remove the library from the project
+    project = get_project()
+    project.remove_app(app_name)
+    project.save()
+    update_vcpkg_manifest(project)
+
+def remove_app_files(app_name: str) -> None:
+    """ Delete the directory of an application """
     # Define the directory structure
     dirs = [
         f"apps/{app_name}",
     ]
     # Delete directories
     for dir in dirs:
-        shutil.rmtree(dir)
-
-    # Remove the library from the project
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-    project['app_count'] -= 1
-    project['apps'] = [app for app in project['apps'] if app['name'] != app_name]
-    with open(PROJECT_DATA_PATH, 'w') as file:
-        json.dump(project, file, indent=4)
+        if os.path.isdir(dir):
+            shutil.rmtree(dir)
 
 if __name__ == "__main__":
     app_name = input("Enter the name of the app: ")
@@ -0,0 +1,66 @@
+""" Compare the configure-time cost of reading the project from JSON and from the manifest """
+
+import json
+import os
+import subprocess
+import tempfile
+import time
+from common import ProjectModel
+from bench_project_cache import make_project_data
+
+SIZES = [10, 100, 500, 1000]
+REPEATS = 3
+
+# The configure loops of CMakeLists.txt, with add_subdirectory replaced by a no-op
+JSON_SCRIPT = '''
+file(READ ${CMAKE_CURRENT_LIST_DIR}/json/project_data.json json_content)
+string(JSON lib_count GET ${json_content} lib_count)
+foreach(lib_index RANGE ${lib_count})
+  string(JSON lib_name GET ${json_content} libs ${lib_index})
+  list(APPEND targets ${lib_name} test_${lib_name})
+endforeach()
+string(JSON app_count GET ${json_content} app_count)
+foreach(app_index RANGE ${app_count})
+  string(JSON app_name GET ${json_content} apps ${app_index} name)
+  list(APPEND targets ${app_name})
+endforeach()
+'''
+
+MANIFEST_SCRIPT = '''
+include(${CMAKE_CURRENT_LIST_DIR}/json/project_manifest.cmake)
+foreach(lib_name IN LISTS PROJECT_LIBS)
+  list(APPEND targets ${lib_name} test_${lib_name})
+endforeach()
+foreach(app_name IN LISTS PROJECT_APPS)
+  list(APPEND targets ${app_name})
+endforeach()
+'''
+
+def time_script(script_path: str) -> float:
+    """ Best time in milliseconds to run a CMake script """
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        subprocess.run(["cmake", "-P", script_path], check=True)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+if __name__ == "__main__":
+    print(f"{'entries':>8} {'json (ms)':>10} {'manifest (ms)':>14} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.makedirs(os.path.join(temp_dir, "json"))
+        json_script = os.path.join(temp_dir, "json_loop.cmake")
+        manifest_script = os.path.join(temp_dir, "manifest_loop.cmake")
+        with open(json_script, 'w') as file:
+            file.write(JSON_SCRIPT)
+        with open(manifest_script, 'w') as file:
+            file.write(MANIFEST_SCRIPT)
+        for entry_count in SIZES:
+            data_path = os.path.join(temp_dir, "json", "project_data.json")
+            with open(data_path, 'w') as file:
+                json.dump(make_project_data(entry_count), file, indent=4)
+            ProjectModel(data_path).write_manifest()
+            json_time = time_script(json_script)
+            manifest_time = time_script(manifest_script)
+            print(f"{entry_count:>8} {json_time:>10.1f} {manifest_time:>14.1f} "
+                  f"{json_time / manifest_time:>7.1f}x")
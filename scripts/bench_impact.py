@@ -0,0 +1,50 @@
+""" Measure the change-impact query on large projects """
+
+import json
+import os
+import tempfile
+import time
+from bench_project_cache import make_project_data
+from common import ProjectModel
+from impact import get_impact, get_lib_dependents_index
+
+SIZES = [1000, 10000, 50000]
+REPEATS = 5
+
+def make_deep_project_data(entry_count: int) -> dict[str, any]:
+    """ Build synthetic project data where each library links the one of half its index """
+    data = make_project_data(entry_count)
+    data["lib_data"] = {f"lib_{index}": {"libs": [f"lib_{index // 2}"]} for index in range(1, entry_count)}
+    return data
+
+def time_query(project: ProjectModel, paths: list[str], dependents: dict[str, list[str]]) -> tuple[float, int]:
+    """ Best time in milliseconds of an impact query, and the number of affected targets """
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        impact = get_impact(project, paths, dependents)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, sum(len(targets) for targets in impact.values())
+
+if __name__ == "__main__":
+    print(f"{'entries':>8} {'index (ms)':>11} {'query':<10} {'time (ms)':>10} {'targets':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for entry_count in SIZES:
+            path = os.path.join(temp_dir, f"project_data_{entry_count}.json")
+            with open(path, 'w') as file:
+                json.dump(make_deep_project_data(entry_count), file)
+            project = ProjectModel(path)
+            start = time.perf_counter()
+            dependents = get_lib_dependents_index(project)
+            project.get_lib_apps("lib_0")
+            index_time = (time.perf_counter() - start) * 1000
+            queries = {
+                "leaf": [f"src/lib_{entry_count - 1}/lib_{entry_count - 1}.cpp"],
+                "mid": [f"include/lib_{entry_count // 64}/lib_{entry_count // 64}.h"],
+                "root": ["src/lib_0/lib_0.cpp"],
+                "100 files": [f"src/lib_{index}/lib_{index}.cpp"
+                              for index in range(entry_count - 100, entry_count)]
+            }
+            for name, paths in queries.items():
+                query_time, target_count = time_query(project, paths, dependents)
+                print(f"{entry_count:>8} {index_time:>11.1f} {name:<10} {query_time:>10.2f} {target_count:>8}")
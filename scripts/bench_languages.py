@@ -0,0 +1,76 @@
+""" Measure the CMake configure time of the project with and without a CUDA library """
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from bench_run import RESULTS_DIR, get_commit
+from bench_scripts_scaling import make_project
+from common import write_if_changed
+
+# Libraries and apps of the synthetic project
+ENTRY_COUNT = 10
+# Fresh configures per variant, the best one is kept
+REPEATS = 3
+# Languages declared by the first library in each variant
+VARIANTS = {"CXX only": ["CXX"], "with CUDA": ["CXX", "CUDA"]}
+
+def set_languages(root: str, languages: list[str]) -> None:
+    """ Declare the languages of the first library and drop the manifest so the configure regenerates it """
+    data_path = os.path.join(root, "json", "project_data.json")
+    with open(data_path, 'r') as file:
+        data = json.load(file)
+    data["lib_data"][data["libs"][0]] = {"languages": languages}
+    with open(data_path, 'w') as file:
+        json.dump(data, file, indent=4)
+    manifest_path = os.path.join(root, "json", "project_manifest.cmake")
+    if os.path.exists(manifest_path):
+        os.remove(manifest_path)
+
+def has_cuda_compiler() -> bool:
+    """ Check if CMake can find a CUDA compiler, from CUDACXX or nvcc on the PATH """
+    return bool(os.environ.get("CUDACXX") or shutil.which("nvcc"))
+
+def time_configure(root: str) -> dict[str, any]:
+    """ Configure a fresh build tree REPEATS times, returning the best wall time and the last status
+
+    The build tree is removed before each run so the toolchains are probed
+    every time, as on a clean checkout.
+    """
+    best = float("inf")
+    returncode = 0
+    for _ in range(REPEATS):
+        shutil.rmtree(os.path.join(root, "out"), ignore_errors=True)
+        start = time.perf_counter()
+        returncode = subprocess.run(["cmake", "-S", ".", "-B", "out/build"], cwd=root,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+        best = min(best, time.perf_counter() - start)
+    return {"wall_time_s": round(best, 4), "status": "ok" if returncode == 0 else f"failed ({returncode})"}
+
+if __name__ == "__main__":
+    results = {}
+    root = tempfile.mkdtemp()
+    try:
+        make_project(root, ENTRY_COUNT)
+        for name, languages in VARIANTS.items():
+            # Without a toolkit enable_language(CUDA) fails at once, the time would mean nothing
+            if "CUDA" in languages and not has_cuda_compiler():
+                results[name] = {"wall_time_s": None, "status": "skipped, no CUDA compiler"}
+                continue
+            set_languages(root, languages)
+            results[name] = time_configure(root)
+    finally:
+        shutil.rmtree(root)
+    commit = get_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_if_changed(f"{RESULTS_DIR}/languages-{commit}.json",
+                     json.dumps({"commit": commit, "results": results}, indent=4) + "\n")
+    print(f"Configure of {ENTRY_COUNT} libraries and apps, best of {REPEATS} fresh run(s)")
+    reference = results["CXX only"]["wall_time_s"]
+    for name, result in results.items():
+        if result["wall_time_s"] is None:
+            print(f"{name:<10} {'-':>10} {'-':>8}  {result['status']}")
+        else:
+            print(f"{name:<10} {result['wall_time_s']:>9.3f}s {result['wall_time_s'] / reference:>7.2f}x  {result['status']}")
@@ -0,0 +1,55 @@
+""" Compare the project model startup time from the JSON file and from its binary snapshot """
+
+import json
+import os
+import tempfile
+import time
+from common import ProjectModel, get_cache_path
+
+SIZES = [10, 1000, 50000]
+REPEATS = 5
+
+def make_project_data(entry_count: int) -> dict[str, any]:
+    """ Build synthetic project data with as many libraries as applications """
+    libs = [f"lib_{index}" for index in range(entry_count)]
+    apps = []
+    for index in range(entry_count):
+        app_libs = [libs[(index + offset) % entry_count] for offset in range(3)]
+        apps.append({"name": f"app_{index}", "lib_count": len(app_libs) - 1, "libs": app_libs})
+    return {"lib_count": entry_count - 1, "libs": libs, "app_count": entry_count - 1, "apps": apps}
+
+def load_from_json(path: str) -> None:
+    """ Build the project model by parsing the JSON file, as before the cache """
+    model = ProjectModel.__new__(ProjectModel)
+    model.path = path
+    with open(path, 'r') as file:
+        model._load(json.load(file))
+
+def load_stale(path: str) -> None:
+    """ Build the project model with a missing snapshot, which rebuilds it """
+    os.remove(get_cache_path(path))
+    ProjectModel(path)
+
+def time_load(load: callable, path: str) -> float:
+    """ Best time in milliseconds of a project model load """
+    best = float("inf")
+    for _ in range(REPEATS):
+        if not os.path.exists(get_cache_path(path)):
+            ProjectModel(path)
+        start = time.perf_counter()
+        load(path)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+if __name__ == "__main__":
+    print(f"{'entries':>8} {'json (ms)':>10} {'stale (ms)':>11} {'cache (ms)':>11} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for entry_count in SIZES:
+            path = os.path.join(temp_dir, f"project_data_{entry_count}.json")
+            with open(path, 'w') as file:
+                json.dump(make_project_data(entry_count), file, indent=4)
+            json_time = time_load(load_from_json, path)
+            stale_time = time_load(load_stale, path)
+            cache_time = time_load(ProjectModel, path)
+            print(f"{entry_count:>8} {json_time:>10.3f} {stale_time:>11.3f} "
+                  f"{cache_time:>11.3f} {json_time / cache_time:>7.1f}x")
@@ -0,0 +1,130 @@
+""" Run the Catch2 benchmarks of libraries and compare them with a stored baseline """
+
+import json
+import math
+import os
+import subprocess
+import xml.etree.ElementTree as ElementTree
+from common import BUILD_DIR, get_project, write_if_changed
+
+# Results of each commit and the baseline they are compared with
+RESULTS_DIR = "bench_results"
+BASELINE_PATH = f"{RESULTS_DIR}/baseline.json"
+# Human readable report of the last run
+REPORT_PATH = "bench_output.txt"
+CONFIGURATION = "Release"
+# Welch's t above which a difference is significant, about a 95% confidence
+SIGNIFICANT_T = 1.96
+# Relative slowdown below which a significant difference is still ignored
+SLOWDOWN_THRESHOLD = 0.05
+
+def get_commit() -> str:
+    """ Get the short hash of the checked out commit, "working-tree" outside of git """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "working-tree"
+
+def get_bench_path(lib_name: str, build_dir: str = BUILD_DIR) -> str:
+    """ Get the benchmark executable of a library in the Ninja Multi-Config build tree """
+    suffix = ".exe" if os.name == 'nt' else ""
+    return f"{build_dir}/bench/{lib_name}/{CONFIGURATION}/bench_{lib_name}{suffix}"
+
+def build_benchs(lib_names: list[str]) -> None:
+    """ Build the benchmark executables of the libraries """
+    targets = [f"bench_{lib_name}" for lib_name in lib_names]
+    subprocess.run(["cmake", "--build", BUILD_DIR, "--config", CONFIGURATION, "--target", *targets],
+                   check=True)
+
+def run_bench(lib_name: str, build_dir: str = BUILD_DIR) -> dict[str, dict[str, float]]:
+    """ Run the benchmark of a library and read the statistics of each benchmark
+
+    Catch2 reports the mean and the standard deviation of the samples in
+    nanoseconds, in the BenchmarkResults elements of its XML reporter.
+    """
+    output = subprocess.run([get_bench_path(lib_name, build_dir), "--reporter", "xml"],
+                            check=True, capture_output=True, text=True).stdout
+    results = {}
+    for element in ElementTree.fromstring(output).iter("BenchmarkResults"):
+        results[f"{lib_name}/{element.get('name')}"] = {
+            "mean": float(element.find("mean").get("value")),
+            "std_dev": float(element.find("standardDeviation").get("value")),
+            "samples": int(element.get("samples"))
+        }
+    return results
+
+def load_results(path: str) -> dict[str, dict[str, float]]:
+    """ Load stored results, empty if there are none """
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as file:
+        return json.load(file)["results"]
+
+def save_results(path: str, commit: str, results: dict[str, dict[str, float]]) -> None:
+    """ Store the results of a run """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_if_changed(path, json.dumps({"commit": commit, "results": results}, indent=4) + "\n")
+
+def welch_t(baseline: dict[str, float], current: dict[str, float]) -> float:
+    """ Welch's t statistic of the difference between two means, positive when slower """
+    variance = (baseline["std_dev"] ** 2 / baseline["samples"]
+                + current["std_dev"] ** 2 / current["samples"])
+    difference = current["mean"] - baseline["mean"]
+    if variance == 0:
+        return 0.0 if difference == 0 else math.copysign(math.inf, difference)
+    return difference / math.sqrt(variance)
+
+def compare_results(baseline: dict[str, dict[str, float]],
+                    current: dict[str, dict[str, float]]) -> list[dict[str, any]]:
+    """ Compare each benchmark with the baseline and classify the difference """
+    rows = []
+    for name, result in current.items():
+        row = {"name": name, "mean": result["mean"], "baseline": None, "change": None, "status": "new"}
+        if name in baseline:
+            reference = baseline[name]
+            change = result["mean"] / reference["mean"] - 1 if reference["mean"] else 0.0
+            t = welch_t(reference, result)
+            row.update(baseline=reference["mean"], change=change)
+            if t > SIGNIFICANT_T and change > SLOWDOWN_THRESHOLD:
+                row["status"] = "REGRESSION"
+            elif t < -SIGNIFICANT_T and change < -SLOWDOWN_THRESHOLD:
+                row["status"] = "improvement"
+            else:
+                row["status"] = "unchanged"
+        rows.append(row)
+    return rows
+
+def format_report(commit: str, rows: list[dict[str, any]]) -> str:
+    """ Format the comparison as a table, regressions first """
+    lines = [f"Benchmarks of {commit} ({CONFIGURATION}), times in ns",
+             f"{'benchmark':<48} {'mean':>12} {'baseline':>12} {'change':>8}  status"]
+    for row in sorted(rows, key=lambda row: row["status"] != "REGRESSION"):
+        baseline = f"{row['baseline']:.1f}" if row["baseline"] is not None else "-"
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        lines.append(f"{row['name']:<48} {row['mean']:>12.1f} {baseline:>12} {change:>8}  {row['status']}")
+    regressions = sum(row["status"] == "REGRESSION" for row in rows)
+    lines.append(f"{regressions} regression(s) out of {len(rows)} benchmark(s).")
+    return "\n".join(lines) + "\n"
+
+if __name__ == "__main__":
+    bench_libs = get_project().get_bench_libs()
+    lib_names = input("Enter the names of the libraries to benchmark (space separated, empty for all): ").split()
+    lib_names = lib_names or bench_libs
+    missing = [lib_name for lib_name in lib_names if lib_name not in bench_libs]
+    if missing:
+        print(f"Library '{missing[0]}' has no benchmark target.")
+    elif not lib_names:
+        print("There are no benchmark targets in the project.")
+    else:
+        build_benchs(lib_names)
+        current = {}
+        for lib_name in lib_names:
+            current.update(run_bench(lib_name))
+        commit = get_commit()
+        save_results(f"{RESULTS_DIR}/{commit}.json", commit, current)
+        report = format_report(commit, compare_results(load_results(BASELINE_PATH), current))
+        write_if_changed(REPORT_PATH, report)
+        print(report, end="")
+        if input("Save these results as the new baseline? (y/n): ").strip().lower() == 'y':
+            save_results(BASELINE_PATH, commit, current)
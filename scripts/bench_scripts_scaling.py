@@ -0,0 +1,163 @@
+""" Measure how the project scripts and the CMake configure scale with the number of libraries and apps """
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from bench_project_cache import make_project_data
+from bench_run import RESULTS_DIR, get_commit
+from common import write_if_changed
+
+SIZES = [10, 100, 1000, 10000, 50000]
+# Largest project whose sources are written for the CMake configure
+CONFIGURE_MAX_ENTRIES = 1000
+# Files and folders of the repository copied into each synthetic project
+PROJECT_FILES = ["CMakeLists.txt", "CMakePresets.json", "CMakeUserPresets.json",
+                 "vcpkg.json", "vcpkg-configuration.json", "docs", "scripts"]
+# Entry points in the order they run, with the answers to their prompts
+STEPS = [
+    ("lib_create", ["scripts/lib_create.py"], "bench_lib\n\n\n\n0\nn\nn\n"),
+    ("lib_config", ["scripts/lib_config.py"], "bench_lib\n"),
+    ("app_create", ["scripts/app_create.py"], "bench_app\n2\nbench_lib\nlib_0\n\n0\nn\nn\n"),
+    ("app_config", ["scripts/app_config.py"], "bench_app\n"),
+    ("app_config_all", ["scripts/app_config.py"], "\n"),
+    ("app_delete", ["scripts/app_delete.py"], "bench_app\n"),
+    ("lib_delete", ["scripts/lib_delete.py"], "bench_lib\n"),
+    ("cmake_configure", ["cmake", "--preset", "default-config"], ""),
+    ("reset", ["scripts/reset.py"], "y\ny\ny\nn\n")
+]
+BASELINE_PATH = f"{RESULTS_DIR}/scaling-baseline.json"
+# Wall time ratio to the baseline above which a step is flagged
+REGRESSION_RATIO = 1.25
+# Steps faster than this, in seconds, are too noisy to be flagged
+MIN_FLAGGED_TIME = 0.1
+
+def make_project(root: str, entry_count: int) -> None:
+    """ Copy the project files into root and fill it with synthetic libraries and apps """
+    for name in PROJECT_FILES:
+        if os.path.isdir(name):
+            shutil.copytree(name, os.path.join(root, name), ignore=shutil.ignore_patterns("__pycache__"))
+        elif os.path.exists(name):
+            shutil.copy2(name, os.path.join(root, name))
+    for folder in ("apps", "include", "src", "tests", "bench", "json", ".vscode"):
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+    data = make_project_data(entry_count)
+    data["lib_data"] = {}
+    with open(os.path.join(root, "json", "project_data.json"), 'w') as file:
+        json.dump(data, file, indent=4)
+    if entry_count <= CONFIGURE_MAX_ENTRIES:
+        # The configure needs the sources of every target, written by the scripts themselves
+        subprocess.run([sys.executable, "-c", (
+            "import json\n"
+            "from lib_create import write_lib_files\n"
+            "from app_create import write_app_files\n"
+            "data = json.load(open('json/project_data.json'))\n"
+            "for lib in data['libs']: write_lib_files(lib)\n"
+            "for app in data['apps']: write_app_files(app['name'], app['libs'])\n"
+        )], cwd=root, check=True, stdout=subprocess.DEVNULL,
+            env={**os.environ, "PYTHONPATH": os.path.join(root, "scripts")})
+
+def snapshot(root: str) -> dict[str, tuple[int, int]]:
+    """ Get the size and modification time of every file of the tree """
+    files = {}
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names[:] = [name for name in dir_names if name != "__pycache__"]
+        for file_name in file_names:
+            stat = os.stat(os.path.join(dir_path, file_name))
+            files[os.path.join(dir_path, file_name)] = (stat.st_size, stat.st_mtime_ns)
+    return files
+
+def get_bytes_written(before: dict[str, tuple[int, int]], after: dict[str, tuple[int, int]]) -> int:
+    """ Sum the sizes of the files created or modified between two snapshots """
+    return sum(size for path, (size, mtime) in after.items() if before.get(path) != (size, mtime))
+
+def run_step(root: str, command: list[str], answers: str) -> dict[str, any]:
+    """ Run an entry point and measure its wall time, peak memory and bytes written
+
+    The peak resident memory comes from wait4, which Windows lacks.
+    """
+    if command[0].endswith(".py"):
+        command = [sys.executable, *command]
+    before = snapshot(root)
+    with tempfile.TemporaryFile('w+') as stdin:
+        stdin.write(answers)
+        stdin.seek(0)
+        start = time.perf_counter()
+        process = subprocess.Popen(command, cwd=root, stdin=stdin,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        peak_memory_kb = None
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in KiB on Linux and in bytes on macOS
+            peak_memory_kb = usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+        else:
+            process.wait()
+        wall_time = time.perf_counter() - start
+    return {
+        "wall_time_s": round(wall_time, 4),
+        "peak_memory_kb": peak_memory_kb,
+        "bytes_written": get_bytes_written(before, snapshot(root)),
+        "status": "ok" if process.returncode == 0 else f"failed ({process.returncode})"
+    }
+
+def run_size(entry_count: int) -> dict[str, dict[str, any]]:
+    """ Run every step on a synthetic project of entry_count libraries and apps """
+    results = {}
+    root = tempfile.mkdtemp()
+    try:
+        make_project(root, entry_count)
+        for name, command, answers in STEPS:
+            if name == "cmake_configure" and entry_count > CONFIGURE_MAX_ENTRIES:
+                continue
+            results[name] = run_step(root, command, answers)
+    finally:
+        shutil.rmtree(root)
+    return results
+
+def find_regressions(baseline: dict[str, any], report: dict[str, any]) -> list[str]:
+    """ List the steps much slower than in the baseline
+
+    Failed runs, in the report or the baseline, are left out: a step that
+    stops early has a time that means nothing.
+    """
+    regressions = []
+    for size, steps in report["sizes"].items():
+        for name, result in steps.items():
+            reference = baseline["sizes"].get(size, {}).get(name)
+            if reference is None or result["status"] != "ok" or reference["status"] != "ok":
+                continue
+            if result["wall_time_s"] < MIN_FLAGGED_TIME:
+                continue
+            ratio = result["wall_time_s"] / max(reference["wall_time_s"], 1e-6)
+            if ratio > REGRESSION_RATIO:
+                regressions.append(f"{name} with {size} entries: {reference['wall_time_s']:.3f}s "
+                                   f"-> {result['wall_time_s']:.3f}s ({ratio:.2f}x)")
+    return regressions
+
+if __name__ == "__main__":
+    commit = get_commit()
+    report = {"commit": commit, "sizes": {}}
+    print(f"{'entries':>8} {'step':<16} {'wall (s)':>9} {'peak (MiB)':>11} {'written (KiB)':>14}  status")
+    for entry_count in SIZES:
+        report["sizes"][str(entry_count)] = run_size(entry_count)
+        for name, result in report["sizes"][str(entry_count)].items():
+            if result["status"] != "ok":
+                print(f"{entry_count:>8} {name:<16} {'-':>9} {'-':>11} {'-':>14}  {result['status']}")
+                continue
+            peak = f"{result['peak_memory_kb'] / 1024:.1f}" if result["peak_memory_kb"] is not None else "-"
+            print(f"{entry_count:>8} {name:<16} {result['wall_time_s']:>9.3f} {peak:>11} "
+                  f"{result['bytes_written'] / 1024:>14.1f}  {result['status']}")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_if_changed(f"{RESULTS_DIR}/scaling-{commit}.json", json.dumps(report, indent=4) + "\n")
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, 'r') as file:
+            regressions = find_regressions(json.load(file), report)
+        print(f"{len(regressions)} scaling regression(s) against the baseline.")
+        for regression in regressions:
+            print(f"  {regression}")
+    if input("Save this report as the new baseline? (y/n): ").strip().lower() == 'y':
+        write_if_changed(BASELINE_PATH, json.dumps(report, indent=4) + "\n")
@@ -0,0 +1,79 @@
+""" Compare the build time of a sample project with and without unity builds and precompiled headers """
+
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from common import write_build_options
+from presets import get_cpu_count
+
+LIB_COUNT = 4
+SOURCES_PER_LIB = 8
+VARIANTS = {
+    "plain": {},
+    "unity": {"unity_build": True, "unity_batch_size": 8},
+    "pch": {"pch": True},
+    "unity+pch": {"unity_build": True, "unity_batch_size": 8, "pch": True}
+}
+# Standard headers whose parsing dominates the compile time of small sources
+HEAVY_HEADERS = ["algorithm", "iostream", "map", "regex", "string", "vector"]
+
+def write_sample_project(root: str, settings: dict[str, any]) -> None:
+    """ Write a sample project whose libraries all use the given build options """
+    with open(os.path.join(root, "CMakeLists.txt"), 'w') as file:
+        file.write('cmake_minimum_required(VERSION 3.21)\n')
+        file.write('project(bench_unity_build CXX)\n')
+        for lib_index in range(LIB_COUNT):
+            file.write(f'add_subdirectory(src/lib_{lib_index})\n')
+    for lib_index in range(LIB_COUNT):
+        lib_name = f"lib_{lib_index}"
+        lib_dir = os.path.join(root, "src", lib_name)
+        os.makedirs(lib_dir)
+        for source_index in range(SOURCES_PER_LIB):
+            with open(os.path.join(lib_dir, f"source_{source_index}.cpp"), 'w') as file:
+                for header in HEAVY_HEADERS:
+                    file.write(f'#include <{header}>\n')
+                file.write(f'namespace {lib_name} {{\n')
+                file.write(f'int function_{source_index}(const std::string& text)\n')
+                file.write('{\n')
+                file.write('    std::map<std::string, int> counts;\n')
+                file.write('    for (const auto& word : std::vector<std::string>{text}) { ++counts[word]; }\n')
+                file.write('    return static_cast<int>(counts.size());\n')
+                file.write('}\n')
+                file.write(f'}} // namespace {lib_name}\n')
+        with open(os.path.join(lib_dir, "pch.h"), 'w') as file:
+            file.write('#pragma once\n\n')
+            for header in HEAVY_HEADERS:
+                file.write(f'#include <{header}>\n')
+        cmake_file = io.StringIO()
+        cmake_file.write('AUX_SOURCE_DIRECTORY(. DIR_LIB_SRCS)\n')
+        cmake_file.write(f'add_library({lib_name} ${{DIR_LIB_SRCS}})\n\n')
+        write_build_options(cmake_file, lib_name, settings)
+        with open(os.path.join(lib_dir, "CMakeLists.txt"), 'w') as file:
+            file.write(cmake_file.getvalue())
+
+def time_build(root: str) -> float:
+    """ Configure the sample project and time a clean build in seconds """
+    build_dir = os.path.join(root, "build")
+    subprocess.run(["cmake", "-S", root, "-B", build_dir, "-DCMAKE_BUILD_TYPE=Release"],
+                   check=True, stdout=subprocess.DEVNULL)
+    start = time.perf_counter()
+    subprocess.run(["cmake", "--build", build_dir, "--parallel", str(get_cpu_count())],
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+if __name__ == "__main__":
+    print(f"{LIB_COUNT} libraries of {SOURCES_PER_LIB} sources, {get_cpu_count()} job(s)")
+    print(f"{'variant':>10} {'build (s)':>10} {'speedup':>8}")
+    plain_time = None
+    for variant, settings in VARIANTS.items():
+        root = tempfile.mkdtemp()
+        try:
+            write_sample_project(root, settings)
+            build_time = time_build(root)
+        finally:
+            shutil.rmtree(root)
+        plain_time = plain_time or build_time
+        print(f"{variant:>10} {build_time:>10.2f} {plain_time / build_time:>7.1f}x")
@@ -0,0 +1,39 @@
+""" Apply unity build and precompiled header settings to existing libraries and applications """
+
+from common import ask_build_options, get_project, write_stats
+from lib_create import write_lib_cmake_files
+from app_create import write_app_cmake_files
+
+BUILD_OPTION_KEYS = ("unity_build", "unity_batch_size", "pch")
+
+def set_build_options(targets: list[str], options: dict[str, any]) -> None:
+    """ Store the settings of the targets and regenerate their CMake files """
+    project = get_project()
+    for target in targets:
+        if project.has_lib(target):
+            data = project.get_lib_data(target)
+        else:
+            data = project.get_app_data(target)
+        for key in BUILD_OPTION_KEYS:
+            data.pop(key, None)
+        data.update(options)
+        if project.has_lib(target):
+            project.add_lib(target, data)
+            write_lib_cmake_files(target, data)
+        else:
+            project.add_app(target, project.get_app_libs(target), data)
+            write_app_cmake_files(target, project.get_app_libs(target), data)
+    project.save()
+
+if __name__ == "__main__":
+    targets = input("Enter the names of the libraries and applications (space separated, empty for all): ").split()
+    project = get_project()
+    if not targets:
+        targets = project.libs + project.apps
+    missing = [target for target in targets if not project.has_lib(target) and not project.has_app(target)]
+    if missing:
+        print(f"'{missing[0]}' is neither a library nor an application of the project.")
+    else:
+        set_build_options(targets, ask_build_options())
+        print(f"Build options applied to {len(targets)} target(s).")
+        print(write_stats.summary())
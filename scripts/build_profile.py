@@ -0,0 +1,250 @@
+""" Profile the last build from .ninja_log and the Clang time traces: per target time, critical path, slowest sources """
+
+import graphlib
+import json
+import os
+from common import BUILD_DIR, ProjectModel, get_path_target, get_project, write_if_changed, write_stats
+from presets import merge_presets, update_user_presets
+
+# Build tree of the Clang -ftime-trace build, kept apart so toggling it doesn't rebuild out/build
+TIME_TRACE_BUILD_DIR = "out/time-trace"
+# Human readable report and Chrome trace (chrome://tracing, Perfetto) of the last profile
+REPORT_PATH = "build_profile.txt"
+TRACE_PATH = "build_trace.json"
+# Rows of the slowest sources and headers
+TOP_COUNT = 20
+# Compiler trace events shorter than this, in microseconds, are left out of the Chrome trace
+MIN_TRACE_EVENT_US = 1000
+OBJECT_SUFFIXES = (".o", ".obj")
+# Configuration directories of Ninja Multi-Config inside CMakeFiles/<target>.dir
+CONFIGURATIONS = ("Debug", "Release", "RelWithDebInfo", "MinSizeRel")
+
+def read_ninja_log(build_dir: str = BUILD_DIR, all_runs: bool = False) -> list[dict[str, any]]:
+    """ Read the edges of the last build from .ninja_log, times in milliseconds
+
+    Ninja appends one line per finished edge, with times relative to the start
+    of its run: the last run starts after the last drop of the end times. An
+    output built twice keeps its last entry. With all_runs, the outputs of the
+    earlier runs are kept too, as the last cost of everything ever built.
+    """
+    with open(os.path.join(build_dir, ".ninja_log"), 'r') as file:
+        lines = file.read().splitlines()
+    edges = {}
+    last_end = 0
+    for line in lines:
+        if line.startswith('#'):
+            continue
+        start, end, _, output, _ = line.split('\t')
+        start, end = int(start), int(end)
+        if end < last_end and not all_runs:
+            edges = {}
+        last_end = end
+        edges[output] = {"output": output, "start": start, "end": end}
+    return sorted(edges.values(), key=lambda edge: edge["start"])
+
+def get_target_deps(project: ProjectModel) -> dict[str, list[str]]:
+    """ Get the project targets and the project targets each one links """
+    deps = {}
+    for lib in project.libs:
+        deps[lib] = project.get_lib_deps(lib)
+        deps[f"test_{lib}"] = [lib]
+    for lib in project.get_bench_libs():
+        deps[f"bench_{lib}"] = [lib]
+    for app in project.apps:
+        deps[app] = project.get_app_libs(app)
+    return deps
+
+def get_target_times(edges: list[dict[str, any]], targets: dict[str, list[str]]) -> dict[str, dict[str, int]]:
+    """ Sum the time of the edges of each target, with its wall span, longest compilation and link time
+
+    Edges of other targets, such as the docs or CMake re-runs, go to "(other)".
+    """
+    times = {}
+    for edge in edges:
+        target = get_path_target(edge["output"])
+        target = target if target in targets else "(other)"
+        entry = times.setdefault(target, {"time": 0, "edges": 0, "start": edge["start"], "end": edge["end"],
+                                          "compile": 0, "link": 0})
+        duration = edge["end"] - edge["start"]
+        entry["time"] += duration
+        entry["edges"] += 1
+        entry["start"] = min(entry["start"], edge["start"])
+        entry["end"] = max(entry["end"], edge["end"])
+        if edge["output"].endswith(OBJECT_SUFFIXES):
+            entry["compile"] = max(entry["compile"], duration)
+        else:
+            entry["link"] += duration
+    return times
+
+def get_finish_times(times: dict[str, dict[str, int]], targets: dict[str, list[str]]) -> tuple[dict[str, int], dict[str, str | None]]:
+    """ Get when each target is done with unlimited cores, with the dependency it waited for last
+
+    The sources of a target compile alongside its dependencies, only its link
+    waits for them: a target is done after its longest compilation or its last
+    dependency, whichever is later, plus its link.
+    """
+    finish = {}
+    previous = {}
+    for target in graphlib.TopologicalSorter(targets).static_order():
+        entry = times.get(target, {"compile": 0, "link": 0})
+        last = max(targets.get(target, []), key=lambda dep: finish[dep], default=None)
+        if last is not None and finish[last] > entry["compile"]:
+            finish[target] = finish[last] + entry["link"]
+            previous[target] = last
+        else:
+            finish[target] = entry["compile"] + entry["link"]
+            previous[target] = None
+    return finish, previous
+
+def get_critical_path(times: dict[str, dict[str, int]], targets: dict[str, list[str]]) -> tuple[int, list[str]]:
+    """ Find the chain of dependent targets that bounds the build time with unlimited cores """
+    finish, previous = get_finish_times(times, targets)
+    if not finish:
+        return 0, []
+    target = max(finish, key=finish.get)
+    total = finish[target]
+    path = []
+    while target is not None:
+        path.append(target)
+        target = previous[target]
+    return total, path[::-1]
+
+def get_object_source(output: str) -> str:
+    """ Get the source of an object file, src/foo/CMakeFiles/foo.dir/Release/foo.cpp.o giving src/foo/foo.cpp """
+    parts = output.replace('\\', '/').split('/')
+    if "CMakeFiles" in parts:
+        index = parts.index("CMakeFiles")
+        rest = parts[index + 2:]
+        if len(rest) > 1 and rest[0] in CONFIGURATIONS:
+            rest = rest[1:]
+        parts = parts[:index] + rest
+    path = '/'.join(parts)
+    for suffix in OBJECT_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+def get_slowest_sources(edges: list[dict[str, any]]) -> list[tuple[str, int]]:
+    """ Get the compilations taking the longest, in milliseconds """
+    compiles = [(get_object_source(edge["output"]), edge["end"] - edge["start"])
+                for edge in edges if edge["output"].endswith(OBJECT_SUFFIXES)]
+    return sorted(compiles, key=lambda item: -item[1])[:TOP_COUNT]
+
+def get_time_trace_path(build_dir: str, output: str) -> str | None:
+    """ Get the -ftime-trace file Clang wrote next to an object, None if there is none """
+    for suffix in OBJECT_SUFFIXES:
+        if output.endswith(suffix):
+            path = os.path.join(build_dir, output[:-len(suffix)] + ".json")
+            return path if os.path.exists(path) else None
+    return None
+
+def read_time_traces(build_dir: str, edges: list[dict[str, any]]) -> dict[str, list[dict[str, any]]]:
+    """ Read the Clang time trace of each object of the build, by output """
+    traces = {}
+    for edge in edges:
+        path = get_time_trace_path(build_dir, edge["output"])
+        if path is not None:
+            with open(path, 'r') as file:
+                traces[edge["output"]] = json.load(file).get("traceEvents", [])
+    return traces
+
+def get_slowest_headers(traces: dict[str, list[dict[str, any]]]) -> list[tuple[str, int, int]]:
+    """ Sum the parse time of each header over every compilation, in milliseconds, with its include count
+
+    Clang records a "Source" event per included file. Its time includes the
+    headers it includes in turn.
+    """
+    headers = {}
+    for events in traces.values():
+        for event in events:
+            if event.get("name") == "Source" and event.get("ph") == "X":
+                header = os.path.normpath(event.get("args", {}).get("detail", ""))
+                total, count = headers.get(header, (0, 0))
+                headers[header] = (total + event.get("dur", 0), count + 1)
+    rows = [(header, total // 1000, count) for header, (total, count) in headers.items()]
+    return sorted(rows, key=lambda row: -row[1])[:TOP_COUNT]
+
+def create_chrome_trace(edges: list[dict[str, any]], traces: dict[str, list[dict[str, any]]]) -> dict[str, any]:
+    """ Lay the edges out on as many rows as Ninja had parallel jobs, with the compiler events inside them """
+    events = []
+    row_ends = []
+    for edge in edges:
+        row = next((index for index, end in enumerate(row_ends) if end <= edge["start"]), len(row_ends))
+        if row == len(row_ends):
+            row_ends.append(0)
+        row_ends[row] = edge["end"]
+        events.append({
+            "name": edge["output"],
+            "cat": get_path_target(edge["output"]) or "(other)",
+            "ph": "X",
+            "ts": edge["start"] * 1000,
+            "dur": (edge["end"] - edge["start"]) * 1000,
+            "pid": 0,
+            "tid": row
+        })
+        for event in traces.get(edge["output"], []):
+            if event.get("ph") == "X" and event.get("dur", 0) >= MIN_TRACE_EVENT_US:
+                events.append({**event, "ts": edge["start"] * 1000 + event["ts"], "pid": 0, "tid": row})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+def format_profile(edges: list[dict[str, any]], times: dict[str, dict[str, int]],
+                   critical_path: tuple[int, list[str]], sources: list[tuple[str, int]],
+                   headers: list[tuple[str, int, int]]) -> str:
+    """ Format the profile as tables, times in seconds """
+    wall = max((edge["end"] for edge in edges), default=0) - min((edge["start"] for edge in edges), default=0)
+    total = sum(edge["end"] - edge["start"] for edge in edges)
+    lines = [f"Build of {len(edges)} edge(s): {wall / 1000:.1f}s wall, {total / 1000:.1f}s of jobs, "
+             f"{total / max(wall, 1):.1f} jobs in parallel on average",
+             "",
+             f"{'target':<40} {'jobs (s)':>9} {'span (s)':>9} {'edges':>6}"]
+    for target, entry in sorted(times.items(), key=lambda item: -item[1]["time"]):
+        lines.append(f"{target:<40} {entry['time'] / 1000:>9.2f} "
+                     f"{(entry['end'] - entry['start']) / 1000:>9.2f} {entry['edges']:>6}")
+    length, path = critical_path
+    lines += ["", f"Critical path: {length / 1000:.2f}s", f"  {' -> '.join(path)}",
+              "", f"{'slowest sources':<64} {'time (s)':>9}"]
+    lines += [f"{source:<64} {duration / 1000:>9.2f}" for source, duration in sources]
+    if headers:
+        lines += ["", f"{'slowest headers':<64} {'time (s)':>9} {'includes':>9}"]
+        lines += [f"{header:<64} {duration / 1000:>9.2f} {count:>9}" for header, duration, count in headers]
+    else:
+        lines += ["", "No Clang time traces, configure with time-trace-config for the header times."]
+    return "\n".join(lines) + "\n"
+
+def set_time_trace_presets() -> None:
+    """ Add the presets of a Clang -ftime-trace build to the CMakeUserPresets.json file """
+    def add_presets(cmake_presets: dict[str, any]) -> None:
+        cmake_presets["configurePresets"] = merge_presets(cmake_presets.get("configurePresets", []), [{
+            "name": "time-trace-config",
+            "inherits": "default-config",
+            "binaryDir": f"${{sourceDir}}/{TIME_TRACE_BUILD_DIR}/",
+            "cacheVariables": {
+                "PROJECT_TIME_TRACE": "ON"
+            }
+        }])
+        cmake_presets["buildPresets"] = merge_presets(cmake_presets.get("buildPresets", []), [{
+            "name": "time-trace-build",
+            "configurePreset": "time-trace-config",
+            "inherits": "release-build"
+        }])
+    update_user_presets(add_presets)
+
+if __name__ == "__main__":
+    if input("Add the Clang -ftime-trace presets? (y/n): ").strip().lower() == 'y':
+        set_time_trace_presets()
+        print(f"Build with the time-trace-build preset, then profile {TIME_TRACE_BUILD_DIR}.")
+    build_dir = input(f"Enter the build tree to profile (empty for {BUILD_DIR}): ").strip() or BUILD_DIR
+    if not os.path.exists(os.path.join(build_dir, ".ninja_log")):
+        print(f"No .ninja_log in '{build_dir}', build it with Ninja first.")
+        exit()
+    edges = read_ninja_log(build_dir)
+    targets = get_target_deps(get_project())
+    times = get_target_times(edges, targets)
+    traces = read_time_traces(build_dir, edges)
+    report = format_profile(edges, times, get_critical_path(times, targets),
+                            get_slowest_sources(edges), get_slowest_headers(traces))
+    write_if_changed(REPORT_PATH, report)
+    write_if_changed(TRACE_PATH, json.dumps(create_chrome_trace(edges, traces)))
+    print(report, end="")
+    print(f"Chrome trace written to {TRACE_PATH}.")
+    print(write_stats.summary())
@@ -0,0 +1,72 @@
+""" Report the compiler cache hits and misses of the last build, per target """
+
+import json
+import os
+import subprocess
+from common import get_path_target
+from presets import CCACHE_STATS_LOG, get_compiler_launcher
+
+# ccache counters of a compilation served from the cache, and of one that was not.
+# A preprocessed hit also logs direct_cache_miss, a miss logs the direct and
+# preprocessed misses too, so only these are counted to count each compilation once.
+CCACHE_HIT_COUNTERS = ("direct_cache_hit", "preprocessed_cache_hit")
+CCACHE_MISS_COUNTER = "cache_miss"
+
+def read_ccache_stats(stats_log: str) -> dict[str, dict[str, int]]:
+    """ Count the hits and misses of each target in a ccache stats log
+
+    ccache appends a "# <source file>" line per compilation, followed by the
+    names of the counters it incremented, such as direct_cache_hit or cache_miss.
+    """
+    stats = {}
+    target = None
+    with open(stats_log, 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('#'):
+                target = get_path_target(line[1:].strip()) or "(other)"
+            elif target is not None and line:
+                counters = stats.setdefault(target, {"hits": 0, "misses": 0})
+                if line in CCACHE_HIT_COUNTERS:
+                    counters["hits"] += 1
+                elif line == CCACHE_MISS_COUNTER:
+                    counters["misses"] += 1
+    return stats
+
+def read_sccache_stats() -> dict[str, dict[str, int]]:
+    """ Count the hits and misses of sccache, which has no per-target statistics """
+    output = subprocess.run(["sccache", "--show-stats", "--stats-format=json"],
+                            check=True, capture_output=True, text=True).stdout
+    stats = json.loads(output)["stats"]
+    hits = sum(stats["cache_hits"]["counts"].values())
+    misses = sum(stats["cache_misses"]["counts"].values())
+    return {"(all targets)": {"hits": hits, "misses": misses}}
+
+def print_report(stats: dict[str, dict[str, int]]) -> None:
+    """ Print the hit rate of each target, worst first """
+    print(f"{'target':<32} {'hits':>6} {'misses':>7} {'hit rate':>9}")
+    rows = sorted(stats.items(), key=lambda item: item[1]["hits"] / max(1, sum(item[1].values())))
+    for target, counters in rows:
+        total = counters["hits"] + counters["misses"]
+        rate = counters["hits"] / total if total else 0.0
+        print(f"{target:<32} {counters['hits']:>6} {counters['misses']:>7} {rate:>8.1%}")
+    hits = sum(counters["hits"] for counters in stats.values())
+    misses = sum(counters["misses"] for counters in stats.values())
+    rate = hits / (hits + misses) if hits + misses else 0.0
+    print(f"{'total':<32} {hits:>6} {misses:>7} {rate:>8.1%}")
+
+if __name__ == "__main__":
+    with open("CMakeUserPresets.json", 'r') as file:
+        launcher = get_compiler_launcher(json.load(file))
+    if launcher == "ccache":
+        if os.path.exists(CCACHE_STATS_LOG):
+            print_report(read_ccache_stats(CCACHE_STATS_LOG))
+            # Start the next build with an empty log
+            os.remove(CCACHE_STATS_LOG)
+        else:
+            print("No compilation went through ccache since the last report.")
+    elif launcher == "sccache":
+        print_report(read_sccache_stats())
+        subprocess.run(["sccache", "--zero-stats"], check=True, stdout=subprocess.DEVNULL)
+    else:
+        print("No compiler cache is configured.")
@@ -1,3 +1,576 @@
 """ declare common functions and variables """
 
+import gc
+import hashlib
+import io
+import json
+import marshal
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
 PROJECT_DATA_PATH = 'json/project_data.json'
+# Build tree of the default-config preset
+BUILD_DIR = "out/build"
+# Keys of an application record that are not settings
+APP_RECORD_KEYS = ("name", "lib_count", "libs")
+# Number of journal entries after which the journal is folded into the JSON file
+JOURNAL_COMPACT_THRESHOLD = 100
+# Number of sources merged in one unity translation unit when no size is given
+DEFAULT_UNITY_BATCH_SIZE = 8
+
+class WriteStats:
+    """ Count the files written and skipped by the scaffold writers """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.written = 0
+        self.skipped = 0
+
+    def record(self, written: bool) -> None:
+        """ Record the outcome of a write """
+        with self._lock:
+            if written:
+                self.written += 1
+            else:
+                self.skipped += 1
+
+    def summary(self) -> str:
+        """ Describe the writes done so far """
+        return f"{self.written} file(s) written, {self.skipped} unchanged."
+
+write_stats = WriteStats()
+
+# Read once, os.umask is process wide and the writers run on thread pools
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+def get_file_mode(path: str) -> int:
+    """ Get the permissions of a file, those a plain open() would give it if it doesn't exist """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~UMASK
+
+def write_if_changed(path: str, content: str) -> bool:
+    """ Atomically write a file, leaving it untouched if its content is the same """
+    # Keep the platform newlines a text-mode write would produce
+    data = content.replace('\n', os.linesep).encode()
+    try:
+        if os.path.getsize(path) == len(data):
+            with open(path, 'rb') as file:
+                if hashlib.sha256(file.read()).digest() == hashlib.sha256(data).digest():
+                    write_stats.record(False)
+                    return False
+    except FileNotFoundError:
+        pass
+    directory = os.path.dirname(path) or '.'
+    file_descriptor, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(file_descriptor, 'wb') as file:
+            file.write(data)
+        # mkstemp creates the file owner-only, give it the mode of the file it replaces
+        os.chmod(temp_path, get_file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    write_stats.record(True)
+    return True
+
+@contextmanager
+def scaffold_file(path: str):
+    """ Render a file in memory, then write it only if its content changed """
+    buffer = io.StringIO()
+    yield buffer
+    write_if_changed(path, buffer.getvalue())
+
+def write_build_options(file: io.TextIOBase, target: str, settings: dict[str, any]) -> None:
+    """ Write the unity build and precompiled header options of a target """
+    if settings.get("unity_build"):
+        batch_size = settings.get("unity_batch_size", DEFAULT_UNITY_BATCH_SIZE)
+        file.write(f'set_target_properties({target} PROPERTIES UNITY_BUILD ON UNITY_BUILD_BATCH_SIZE {batch_size})\n\n')
+    if settings.get("pch"):
+        file.write(f'target_precompile_headers({target} PRIVATE ${{CMAKE_CURRENT_SOURCE_DIR}}/pch.h)\n\n')
+
+def ask_build_options() -> dict[str, any]:
+    """ Ask for the unity build and precompiled header settings of a target """
+    options = {}
+    batch_size = int(input("Enter the unity build batch size (0 to disable): ") or 0)
+    if batch_size > 0:
+        options["unity_build"] = True
+        options["unity_batch_size"] = batch_size
+    if input("Use a precompiled header? (y/n): ").strip().lower() == 'y':
+        options["pch"] = True
+    return options
+
+def cmake_regex_escape(text: str) -> str:
+    """ Escape the special characters of a CMake regular expression """
+    return "".join(f"\\{char}" if char in "^$.|?*+()[]{}\\" else char for char in text)
+
+def get_path_target(path: str) -> str | None:
+    """ Get the target a source or build file belongs to, None if it belongs to none """
+    if os.path.isabs(path):
+        path = os.path.relpath(path)
+    parts = path.replace('\\', '/').split('/')
+    # Object files and unity sources live in CMakeFiles/<target>.dir
+    for index, part in enumerate(parts[:-1]):
+        if part == "CMakeFiles" and parts[index + 1].endswith(".dir"):
+            return parts[index + 1][:-len(".dir")]
+    if parts[:2] == ["out", "build"]:
+        parts = parts[2:]
+    if len(parts) < 3:
+        return None
+    if parts[0] in ("src", "include", "apps"):
+        return parts[1]
+    if parts[0] == "tests":
+        return f"test_{parts[1]}"
+    if parts[0] == "bench":
+        return f"bench_{parts[1]}"
+    return None
+
+def get_journal_path(path: str) -> str:
+    """ Get the path of the mutation journal kept next to a JSON file """
+    return f"{os.path.splitext(path)[0]}.journal"
+
+def get_manifest_path(path: str) -> str:
+    """ Get the path of the CMake manifest generated from a project data file """
+    return os.path.join(os.path.dirname(path), "project_manifest.cmake")
+
+def get_file_key(path: str) -> tuple[int, int]:
+    """ Get the size and mtime identifying a version of a file """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def get_cache_path(path: str) -> str:
+    """ Get the path of the binary snapshot kept next to a JSON file """
+    return f"{os.path.splitext(path)[0]}.cache"
+
+def read_cache(path: str) -> dict[str, any] | None:
+    """ Load the binary snapshot of a JSON file if it is still fresh """
+    try:
+        stat = os.stat(path)
+        with open(get_cache_path(path), 'rb') as file:
+            raw = file.read()
+        header_size = int.from_bytes(raw[:4], 'little')
+        header = marshal.loads(raw[4:4 + header_size])
+        if header["version"] != marshal.version or header["size"] != stat.st_size:
+            return None
+        if header["mtime"] != stat.st_mtime_ns:
+            # Touched but maybe not modified: compare the content hash
+            with open(path, 'rb') as json_file:
+                digest = hashlib.sha256(json_file.read()).hexdigest()
+            if digest != header["hash"]:
+                return None
+            data = load_marshal(raw[4 + header_size:])
+            write_cache(path, data, digest)
+            return data
+        return load_marshal(raw[4 + header_size:])
+    except (OSError, EOFError, ValueError, TypeError, KeyError):
+        return None
+
+def load_marshal(raw: bytes) -> any:
+    """ Unmarshal a large object without triggering the cyclic garbage collector """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return marshal.loads(raw)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+def write_cache(path: str, data: dict[str, any], digest: str) -> None:
+    """ Write the binary snapshot of a JSON file, keyed on its size, mtime and hash """
+    stat = os.stat(path)
+    header = marshal.dumps({
+        "version": marshal.version,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "hash": digest
+    })
+    cache_path = get_cache_path(path)
+    temp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'wb') as file:
+            file.write(len(header).to_bytes(4, 'little'))
+            file.write(header)
+            file.write(marshal.dumps(data))
+        os.replace(temp_path, cache_path)
+    except OSError:
+        # The cache is only an accelerator, the JSON stays the source of truth
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def load_json_cached(path: str) -> dict[str, any]:
+    """ Load a JSON file through its binary snapshot, rebuilding it when stale """
+    data = read_cache(path)
+    if data is None:
+        with open(path, 'rb') as file:
+            raw = file.read()
+        data = json.loads(raw)
+        write_cache(path, data, hashlib.sha256(raw).hexdigest())
+    return data
+
+def dump_json_cached(path: str, data: dict[str, any]) -> None:
+    """ Atomically write a JSON file and refresh its binary snapshot """
+    raw = json.dumps(data, indent=4).encode()
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(raw)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    write_cache(path, data, hashlib.sha256(raw).hexdigest())
+
+@contextmanager
+def project_lock(path: str):
+    """ Hold the advisory lock serializing writers of a project data file """
+    with open(f"{os.path.splitext(path)[0]}.lock", 'a+') as file:
+        if os.name == 'nt':
+            import msvcrt
+            file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after 10 seconds, keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+class ProjectModel:
+    """ In-memory view of the project data with hash indexes for O(1) lookups
+
+    Mutations are appended to a journal next to project_data.json instead of
+    rewriting it. Readers replay the journal over the base snapshot, and the
+    journal is compacted into the base file once it grows past a threshold.
+    """
+
+    def __init__(self, path: str = PROJECT_DATA_PATH) -> None:
+        self.path = path
+        self.journal_path = get_journal_path(path)
+        self._pending: list[dict[str, any]] = []
+        self._read()
+
+    def _read(self) -> None:
+        """ Load the base snapshot and replay the journal over it """
+        self._load(load_json_cached(self.path))
+        self._base_key = get_file_key(self.path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+        self._replay_journal()
+
+    def _replay_journal(self) -> None:
+        """ Apply the journal entries appended since the last replay """
+        try:
+            with open(self.journal_path, 'rb') as file:
+                file.seek(self._journal_offset)
+                raw = file.read()
+        except FileNotFoundError:
+            return
+        # Ignore a trailing entry still being written by another process
+        end = raw.rfind(b'\n') + 1
+        for line in raw[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+                self._journal_entries += 1
+        self._journal_offset += end
+
+    def _is_stale(self) -> bool:
+        """ Check if another process changed the project data since it was read """
+        if get_file_key(self.path) != self._base_key:
+            return True
+        try:
+            return os.path.getsize(self.journal_path) != self._journal_offset
+        except FileNotFoundError:
+            return self._journal_offset != 0
+
+    def _refresh(self) -> None:
+        """ Re-read the project data and re-apply the pending mutations on top """
+        if self._is_stale():
+            self._read()
+            for entry in self._pending:
+                self._apply(entry)
+
+    def refresh(self) -> bool:
+        """ Catch up with the changes saved by other processes, returning True if there were any
+
+        Entries appended to the journal are replayed over the model in memory,
+        it is only re-read when project_data.json itself changed.
+        """
+        if not self._is_stale():
+            return False
+        if get_file_key(self.path) == self._base_key and not self._pending:
+            self._replay_journal()
+        else:
+            self._refresh()
+        return True
+
+    def _load(self, project_data: dict[str, any]) -> None:
+        """ Build the indexes from the raw project data """
+        # Dicts keep insertion order, so the JSON lists round-trip unchanged
+        self._libs = dict.fromkeys(project_data['libs'])
+        self._apps = {app['name']: app for app in project_data['apps']}
+        # Optional per-library settings, such as the libraries it depends on
+        self._lib_data = {lib: dict(data) for lib, data in project_data.get('lib_data', {}).items()}
+        # The reverse lib -> apps index is only built when first queried
+        self._lib_apps: dict[str, set[str]] | None = None
+
+    def _get_lib_apps_index(self) -> dict[str, set[str]]:
+        """ Get the reverse lib -> apps index, building it on first use """
+        if self._lib_apps is None:
+            self._lib_apps = {}
+            for app in self._apps.values():
+                self._index_app(app)
+        return self._lib_apps
+
+    def _index_app(self, app: dict[str, any]) -> None:
+        """ Register the app in the reverse lib -> apps index """
+        if self._lib_apps is None:
+            return
+        for lib in app['libs']:
+            self._lib_apps.setdefault(lib, set()).add(app['name'])
+
+    def _unindex_app(self, app: dict[str, any]) -> None:
+        """ Remove the app from the reverse lib -> apps index """
+        if self._lib_apps is None:
+            return
+        for lib in app['libs']:
+            users = self._lib_apps.get(lib)
+            if users is not None:
+                users.discard(app['name'])
+                if not users:
+                    del self._lib_apps[lib]
+
+    @property
+    def libs(self) -> list[str]:
+        """ Names of the libraries, in creation order """
+        return list(self._libs)
+
+    @property
+    def apps(self) -> list[str]:
+        """ Names of the applications, in creation order """
+        return list(self._apps)
+
+    def has_lib(self, lib_name: str) -> bool:
+        """ Check if the library is in the project """
+        return lib_name in self._libs
+
+    def has_app(self, app_name: str) -> bool:
+        """ Check if the application is in the project """
+        return app_name in self._apps
+
+    def get_app_libs(self, app_name: str) -> list[str]:
+        """ Get the libraries used by the application """
+        app = self._apps.get(app_name)
+        return list(app['libs']) if app is not None else []
+
+    def get_lib_apps(self, lib_name: str) -> list[str]:
+        """ Get the applications using the library """
+        return sorted(self._get_lib_apps_index().get(lib_name, ()))
+
+    def get_lib_data(self, lib_name: str) -> dict[str, any]:
+        """ Get the settings of the library """
+        return dict(self._lib_data.get(lib_name, {}))
+
+    def get_app_data(self, app_name: str) -> dict[str, any]:
+        """ Get the settings of the application """
+        app = self._apps.get(app_name, {})
+        return {key: value for key, value in app.items() if key not in APP_RECORD_KEYS}
+
+    def get_lib_deps(self, lib_name: str) -> list[str]:
+        """ Get the libraries the library links directly """
+        return list(self._lib_data.get(lib_name, {}).get('libs', []))
+
+    def get_lib_dependents(self, lib_name: str) -> list[str]:
+        """ Get the libraries linking the library directly """
+        return [lib for lib in self._libs if lib_name in self._lib_data.get(lib, {}).get('libs', [])]
+
+    def get_bench_libs(self) -> list[str]:
+        """ Get the libraries having a benchmark target """
+        return [lib for lib in self._libs if self._lib_data.get(lib, {}).get('bench')]
+
+    def get_languages(self) -> list[str]:
+        """ Get the languages declared by the libraries besides C++, each listed once """
+        languages = {}
+        for lib in self._libs:
+            languages.update(dict.fromkeys(self._lib_data.get(lib, {}).get('languages', [])))
+        languages.pop("CXX", None)
+        return list(languages)
+
+    def get_lib_closure(self, libs: list[str]) -> list[str]:
+        """ Get the libraries and everything they depend on, each listed once """
+        closure = {}
+        stack = list(reversed(libs))
+        while stack:
+            lib = stack.pop()
+            if lib in closure:
+                continue
+            closure[lib] = None
+            stack.extend(reversed(self._lib_data.get(lib, {}).get('libs', [])))
+        return list(closure)
+
+    @property
+    def dirty(self) -> bool:
+        """ Check if the model has mutations not yet saved """
+        return bool(self._pending)
+
+    def _apply(self, entry: dict[str, any]) -> None:
+        """ Apply a journal entry, ignoring ones already reflected in the model """
+        name = entry["name"]
+        if entry["op"] == "add_lib":
+            self._libs.setdefault(name, None)
+            if entry.get("data"):
+                self._lib_data[name] = dict(entry["data"])
+            else:
+                self._lib_data.pop(name, None)
+        elif entry["op"] == "remove_lib":
+            self._libs.pop(name, None)
+            self._lib_data.pop(name, None)
+        elif entry["op"] == "add_app":
+            if name in self._apps:
+                self._unindex_app(self._apps[name])
+            app_data = {
+                "name": name,
+                "lib_count": len(entry["libs"]) - 1,
+                "libs": list(entry["libs"]),
+                **entry.get("data", {})
+            }
+            self._apps[name] = app_data
+            self._index_app(app_data)
+        elif entry["op"] == "set_app_data":
+            if name in self._apps and entry["key"] not in APP_RECORD_KEYS:
+                self._apps[name][entry["key"]] = entry["value"]
+        elif entry["op"] == "remove_app":
+            if name in self._apps:
+                self._unindex_app(self._apps.pop(name))
+        else:
+            raise ValueError(f"Unknown journal operation '{entry['op']}'")
+
+    def _record(self, entry: dict[str, any]) -> None:
+        """ Apply a mutation and queue it for the journal """
+        self._apply(entry)
+        self._pending.append(entry)
+
+    def add_lib(self, lib_name: str, data: dict[str, any] | None = None) -> None:
+        """ Add a library to the project, with its optional settings """
+        entry = {"op": "add_lib", "name": lib_name}
+        if data:
+            entry["data"] = data
+        self._record(entry)
+
+    def remove_lib(self, lib_name: str) -> None:
+        """ Remove a library from the project """
+        self._record({"op": "remove_lib", "name": lib_name})
+
+    def add_app(self, app_name: str, libs: list[str], data: dict[str, any] | None = None) -> None:
+        """ Add an application to the project, with its optional settings """
+        entry = {"op": "add_app", "name": app_name, "libs": list(libs)}
+        if data:
+            entry["data"] = {key: value for key, value in data.items() if key not in APP_RECORD_KEYS}
+        self._record(entry)
+
+    def set_app_data(self, app_name: str, key: str, value: any) -> None:
+        """ Change one setting of an application """
+        self._record({"op": "set_app_data", "name": app_name, "key": key, "value": value})
+
+    def remove_app(self, app_name: str) -> None:
+        """ Remove an application from the project """
+        self._record({"op": "remove_app", "name": app_name})
+
+    def to_dict(self) -> dict[str, any]:
+        """ Serialize the model in the project_data.json layout """
+        return {
+            "lib_count": len(self._libs) - 1,
+            "libs": list(self._libs),
+            "app_count": len(self._apps) - 1,
+            "apps": list(self._apps.values()),
+            "lib_data": {lib: self._lib_data[lib] for lib in self._libs if self._lib_data.get(lib)}
+        }
+
+    def save(self) -> None:
+        """ Append the pending mutations to the journal, compacting it when it grows """
+        if not self._pending:
+            return
+        with project_lock(self.path):
+            # Entries from concurrent writers go first, ours are re-applied after them
+            self._refresh()
+            raw = b''.join(json.dumps(entry).encode() + b'\n' for entry in self._pending)
+            with open(self.journal_path, 'ab') as file:
+                file.write(raw)
+                file.flush()
+                os.fsync(file.fileno())
+            self._journal_offset += len(raw)
+            self._journal_entries += len(self._pending)
+            self._pending = []
+            if self._journal_entries >= JOURNAL_COMPACT_THRESHOLD:
+                self._compact()
+            self.write_manifest()
+
+    def compact(self) -> None:
+        """ Fold the journal into project_data.json """
+        with project_lock(self.path):
+            self._refresh()
+            self._compact()
+        self.write_manifest()
+
+    def _compact(self) -> None:
+        """ Rewrite the base snapshot and truncate the journal, with the lock held """
+        # Entries are idempotent, so a crash before the truncation only replays them again
+        dump_json_cached(self.path, self.to_dict())
+        with open(self.journal_path, 'wb'):
+            pass
+        self._base_key = get_file_key(self.path)
+        self._journal_offset = 0
+        self._journal_entries = 0
+
+    def render_manifest(self) -> str:
+        """ Render the project as flat CMake list variables """
+        lines = [
+            "# Generated from json/project_data.json by scripts/manifest.py, do not edit",
+            f"set(PROJECT_LIBS \"{';'.join(self._libs)}\")",
+            f"set(PROJECT_APPS \"{';'.join(self._apps)}\")",
+            f"set(PROJECT_BENCH_LIBS \"{';'.join(self.get_bench_libs())}\")",
+            f"set(PROJECT_LANGUAGES \"{';'.join(self.get_languages())}\")"
+        ]
+        for lib in self._libs:
+            deps = self._lib_data.get(lib, {}).get('libs')
+            if deps:
+                lines.append(f"set(PROJECT_LIB_{lib}_LIBS \"{';'.join(deps)}\")")
+        for app in self._apps.values():
+            lines.append(f"set(PROJECT_APP_{app['name']}_LIBS \"{';'.join(app['libs'])}\")")
+        return '\n'.join(lines) + '\n'
+
+    def write_manifest(self) -> bool:
+        """ Write the CMake manifest when its content changed, returning True if it did
+
+        An unchanged manifest only gets its modification time updated, so the
+        IS_NEWER_THAN check in CMakeLists.txt stops regenerating it.
+        """
+        manifest_path = get_manifest_path(self.path)
+        if write_if_changed(manifest_path, self.render_manifest()):
+            return True
+        # Mark it fresh for the staleness check in CMakeLists.txt
+        os.utime(manifest_path)
+        return False
+
+_project: ProjectModel | None = None
+
+def get_project() -> ProjectModel:
+    """ Get the project model, loading project_data.json once per process """
+    global _project
+    if _project is None:
+        _project = ProjectModel()
+    return _project
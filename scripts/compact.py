@@ -0,0 +1,7 @@
+""" Fold the project data journal into json/project_data.json """
+
+from common import get_project
+
+if __name__ == "__main__":
+    get_project().compact()
+    print("Project data compacted successfully.")
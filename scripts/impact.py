@@ -0,0 +1,148 @@
+""" Find the targets and tests affected by a change and write presets building only them """
+
+import json
+import os
+import subprocess
+from common import ProjectModel, cmake_regex_escape, get_project, write_stats
+from presets import merge_presets, update_user_presets
+
+# Name of the temporary build and test presets
+IMPACT_PRESET = "impact"
+# Files whose change affects every target
+GLOBAL_PATHS = ["CMakeLists.txt", "CMakePresets.json", "CMakeUserPresets.json",
+                "vcpkg.json", "vcpkg-configuration.json", "json/project_data.json"]
+
+def get_changed_paths(revision: str) -> list[str]:
+    """ List the files changed since a git revision, including untracked ones """
+    changed = subprocess.run(["git", "diff", "--name-only", revision],
+                             check=True, capture_output=True, text=True).stdout.split("\n")
+    untracked = subprocess.run(["git", "ls-files", "--others", "--exclude-standard"],
+                               check=True, capture_output=True, text=True).stdout.split("\n")
+    return [path for path in changed + untracked if path]
+
+def get_path_owner(path: str) -> tuple[str, str] | None:
+    """ Get the kind ("lib", "test", "bench", "app" or "all") and name owning a path
+
+    None for paths that don't affect any target, such as the scripts.
+    """
+    path = os.path.relpath(os.path.abspath(path)).replace(os.sep, "/")
+    if path in GLOBAL_PATHS:
+        return ("all", "")
+    parts = path.split("/")
+    if len(parts) < 3:
+        return None
+    if parts[0] in ("src", "include"):
+        return ("lib", parts[1])
+    if parts[0] == "tests":
+        return ("test", parts[1])
+    if parts[0] == "bench":
+        return ("bench", parts[1])
+    if parts[0] == "apps":
+        return ("app", parts[1])
+    return None
+
+def get_lib_dependents_index(project: ProjectModel) -> dict[str, list[str]]:
+    """ Build the reverse index of the libraries linking each library """
+    dependents = {}
+    for lib in project.libs:
+        for dep in project.get_lib_deps(lib):
+            dependents.setdefault(dep, []).append(lib)
+    return dependents
+
+def get_impact(project: ProjectModel, paths: list[str],
+               dependents: dict[str, list[str]] | None = None) -> dict[str, list[str]]:
+    """ Get the libraries, tests, benchmarks and apps affected by changed paths
+
+    A changed library affects the libraries linking it, transitively, and the
+    apps using any of them. A changed test, benchmark or app only affects itself.
+    """
+    owners = [owner for owner in map(get_path_owner, paths) if owner is not None]
+    if any(kind == "all" for kind, _ in owners):
+        libs = project.libs
+        return {
+            "libs": libs,
+            "tests": libs,
+            "benchs": project.get_bench_libs(),
+            "apps": project.apps
+        }
+    if dependents is None:
+        dependents = get_lib_dependents_index(project)
+    libs = {}
+    stack = [name for kind, name in owners if kind == "lib" and project.has_lib(name)]
+    while stack:
+        lib = stack.pop()
+        if lib not in libs:
+            libs[lib] = None
+            stack.extend(dependents.get(lib, ()))
+    tests = dict.fromkeys(libs)
+    tests.update((name, None) for kind, name in owners if kind == "test" and project.has_lib(name))
+    benchs = {lib: None for lib in libs if project.get_lib_data(lib).get("bench")}
+    benchs.update((name, None) for kind, name in owners if kind == "bench" and project.has_lib(name))
+    apps = {app: None for lib in libs for app in project.get_lib_apps(lib)}
+    apps.update((name, None) for kind, name in owners if kind == "app" and project.has_app(name))
+    return {"libs": list(libs), "tests": list(tests), "benchs": list(benchs), "apps": list(apps)}
+
+def get_impact_targets(impact: dict[str, list[str]]) -> list[str]:
+    """ Get the build targets of an impact """
+    return [*impact["apps"], *impact["libs"],
+            *[f"test_{lib}" for lib in impact["tests"]],
+            *[f"bench_{lib}" for lib in impact["benchs"]]]
+
+def get_test_filter(impact: dict[str, list[str]]) -> str:
+    """ Get the CTest regular expression selecting the tests discovered from the affected test targets """
+    return f"^({'|'.join(cmake_regex_escape(f'test_{lib}') for lib in impact['tests'])})/"
+
+def create_impact_presets(project: ProjectModel,
+                          impact: dict[str, list[str]]) -> tuple[dict[str, any], dict[str, any]]:
+    """ Create the release build preset and the test preset of an impact """
+    build_preset = {
+        "name": f"{IMPACT_PRESET}-release-build",
+        "inherits": "release-build",
+        "targets": get_impact_targets(impact)
+    }
+    test_preset = {
+        "name": f"{IMPACT_PRESET}-test",
+        "inherits": "release-test",
+        "filter": {
+            "include": {
+                "name": get_test_filter(impact)
+            }
+        }
+    }
+    # Every test is affected, a filter would only slow CTest down
+    if len(impact["tests"]) == len(project.libs):
+        del test_preset["filter"]
+    return build_preset, test_preset
+
+if __name__ == "__main__":
+    paths = input("Enter the changed paths (space separated, empty to use git): ").split()
+    if not paths:
+        revision = input("Enter the git revision to compare with (empty for HEAD): ") or "HEAD"
+        paths = get_changed_paths(revision)
+    project = get_project()
+    impact = get_impact(project, paths)
+
+    targets = get_impact_targets(impact)
+
+    def set_impact_presets(cmake_presets: dict[str, any]) -> None:
+        # Drop the presets of a previous run, they may select targets no longer affected
+        cmake_presets["buildPresets"] = [preset for preset in cmake_presets.get("buildPresets", [])
+                                         if preset["name"] != f"{IMPACT_PRESET}-release-build"]
+        cmake_presets["testPresets"] = [preset for preset in cmake_presets.get("testPresets", [])
+                                        if preset["name"] != f"{IMPACT_PRESET}-test"]
+        if targets:
+            build_preset, test_preset = create_impact_presets(project, impact)
+            cmake_presets["buildPresets"] = merge_presets(cmake_presets["buildPresets"], [build_preset])
+            if impact["tests"]:
+                cmake_presets["testPresets"] = merge_presets(cmake_presets["testPresets"], [test_preset])
+    update_user_presets(set_impact_presets)
+
+    if not targets:
+        print("No target is affected by the change.")
+    else:
+        print(f"{len(impact['libs'])} lib(s), {len(impact['tests'])} test target(s), "
+              f"{len(impact['benchs'])} benchmark(s) and {len(impact['apps'])} app(s) affected.")
+        print(f"Build them with: cmake --build --preset {IMPACT_PRESET}-release-build")
+        if impact["tests"]:
+            print(f"Test them with: ctest --preset {IMPACT_PRESET}-test")
+    print(write_stats.summary())
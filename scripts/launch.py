@@ -0,0 +1,82 @@
+""" Shared helpers for the generated .vscode/launch.json """
+
+import json
+import os
+import shutil
+from presets import VENDOR_KEY
+
+# Debuggers of the other hosts, in order of preference
+DEBUGGERS = ["gdb", "lldb"]
+
+def get_debugger() -> str:
+    """ Get the debugger of the launch configurations, cppvsdbg on Windows, gdb or lldb elsewhere
+
+    The "debugger" value of the "vendor" map of CMakeUserPresets.json selects
+    gdb or lldb explicitly.
+    """
+    if os.name == 'nt':
+        return "cppvsdbg"
+    if os.path.exists("CMakeUserPresets.json"):
+        with open("CMakeUserPresets.json", 'r') as file:
+            overrides = json.load(file).get("vendor", {}).get(VENDOR_KEY, {})
+        if overrides.get("debugger") in DEBUGGERS:
+            return overrides["debugger"]
+    for debugger in DEBUGGERS:
+        if shutil.which(debugger):
+            return debugger
+    return "gdb"
+
+def create_launch_config(name: str, program: str, debugger: str) -> dict[str, any]:
+    """ Create the launch configuration of an executable for a debugger """
+    if debugger == "cppvsdbg":
+        return {
+            "name": name,
+            "type": "cppvsdbg",
+            "request": "launch",
+            "program": f"{program}.exe",
+            "args": [],
+            "stopAtEntry": False,
+            "cwd": "${workspaceFolder}",
+            "environment": [],
+            "console": "internalConsole"
+        }
+    if debugger == "lldb":
+        # CodeLLDB, the Microsoft C/C++ extension only drives lldb on macOS
+        return {
+            "name": name,
+            "type": "lldb",
+            "request": "launch",
+            "program": program,
+            "args": [],
+            "cwd": "${workspaceFolder}"
+        }
+    return {
+        "name": name,
+        "type": "cppdbg",
+        "request": "launch",
+        "program": program,
+        "args": [],
+        "stopAtEntry": False,
+        "cwd": "${workspaceFolder}",
+        "environment": [],
+        "externalConsole": False,
+        "MIMode": "gdb",
+        "setupCommands": [
+            {
+                "description": "Enable pretty-printing for gdb",
+                "text": "-enable-pretty-printing",
+                "ignoreFailures": True
+            }
+        ]
+    }
+
+def create_launch_configs(label: str, directory: str, executable: str, debugger: str) -> list[dict[str, any]]:
+    """ Create the Release and Debug launch configurations of an executable of the build tree
+
+    directory is relative to out/build, the executable has no extension.
+    """
+    return [
+        create_launch_config(f"{configuration} {label}",
+                             f"${{workspaceFolder}}/out/build/{directory}/{configuration}/{executable}", debugger)
+        for configuration in ("Release", "Debug")
+    ]
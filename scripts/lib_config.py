@@ -1,35 +1,40 @@
 """ Create the directory structure for a library """
 import json
-from common import PROJECT_DATA_PATH
+from common import get_project, scaffold_file, write_stats
+from launch import create_launch_configs, get_debugger
+from presets import merge_presets, update_user_presets
 
 def lib_in_project(lib_name: str) -> bool:
     """ Check if the library is in the project """
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-    return lib_name in project['libs']
+    return get_project().has_lib(lib_name)
 
 def set_build_config_and_packaging(lib_name: str) -> None:
     """ set the build configuration for the CMakeUserPresets.json file """
     build_presets = create_build_presets(lib_name)
     package_presets = create_package_presets(lib_name)
 
-    # Write the CMakeUserPresets.json file
-    with open("CMakeUserPresets.json", 'r') as file:
-        cmake_presets = json.load(file)
-    cmake_presets["buildPresets"] = build_presets
-    cmake_presets["packagePresets"] = package_presets
-    with open("CMakeUserPresets.json", 'w') as file:
-        json.dump(cmake_presets, file, indent=4)
+    # Write the CMakeUserPresets.json file, keeping the presets of other targets
+    def add_presets(cmake_presets: dict[str, any]) -> None:
+        cmake_presets["buildPresets"] = merge_presets(cmake_presets.get("buildPresets", []), build_presets)
+        cmake_presets["packagePresets"] = merge_presets(cmake_presets.get("packagePresets", []), package_presets)
+    update_user_presets(add_presets)
 
     print(f"Build configuration and packaging for '{lib_name}' added successfully.")
 
+def get_targets(lib_name: str) -> list[str]:
+    """ Get the targets of the library: itself, its test and its benchmark if any """
+    targets = [lib_name, f"test_{lib_name}"]
+    if get_project().get_lib_data(lib_name).get("bench"):
+        targets.append(f"bench_{lib_name}")
+    return targets
+
 def create_build_presets(lib_name: str) -> list[dict[str, any]]:
     """ Create build presets for the new library """
+    targets = get_targets(lib_name)
     return [
         {
             "name": "common-build",
             "configurePreset": "default-config",
-            "jobs": 6,
             "hidden": True
         },
         {
@@ -61,25 +66,24 @@ def create_build_presets(lib_name: str) -> list[dict[str, any]]:
         {
             "name": f"{lib_name}-release-build",
             "inherits": "release-build",
-            "targets": [
-                lib_name,
-                f"test_{lib_name}"
-            ]
+            "targets": targets
         },
         {
             "name": f"{lib_name}-debug-build",
             "inherits": "debug-build",
-            "targets": [
-                lib_name,
-                f"test_{lib_name}"
-            ]
+            "targets": targets
         },
         {
             "name": f"{lib_name}-debinfo-build",
             "inherits": "debinfo-build",
+            "targets": targets
+        },
+        {
+            "name": f"{lib_name}-docs-build",
+            "configurePreset": "default-config",
+            "configuration": "Release",
             "targets": [
-                lib_name,
-                f"test_{lib_name}"
+                f"docs_{lib_name}"
             ]
         }
     ]
@@ -93,7 +97,7 @@ def create_package_presets(lib_name: str) -> list[dict[str, any]]:
             "displayName": "default-package",
             "configurePreset": "default-config",
             "generators": [
-                "TGZ"
+                "TZST"
             ],
             "output": {
                 "debug": False,
@@ -114,34 +118,11 @@ def create_package_presets(lib_name: str) -> list[dict[str, any]]:
 def set_launch_config(lib_name: str) -> None:
     """ Set the launch configuration in the .vscode/launch.json file """
     data = {
-        "configurations": [],
+        "configurations": create_launch_configs(lib_name, f"tests/{lib_name}", f"test_{lib_name}", get_debugger()),
     }
-    # Set the new launch configurations
-    data["configurations"].append({
-        "name": f"Release {lib_name}",
-        "type": "cppvsdbg",
-        "request": "launch",
-        "program": f"${{workspaceFolder}}/out/build/tests/{lib_name}/Release/test_{lib_name}.exe",
-        "args": [],
-        "stopAtEntry": False,
-        "cwd": "${workspaceFolder}",
-        "environment": [],
-        "console": "internalConsole"
-    })
-    data["configurations"].append({
-        "name": f"Debug {lib_name}",
-        "type": "cppvsdbg",
-        "request": "launch",
-        "program": f"${{workspaceFolder}}/out/build/tests/{lib_name}/Debug/test_{lib_name}.exe",
-        "args": [],
-        "stopAtEntry": False,
-        "cwd": "${workspaceFolder}",
-        "environment": [],
-        "console": "internalConsole"
-    })
 
     # Write the updated launch.json file
-    with open(".vscode/launch.json", 'w') as file:
+    with scaffold_file(".vscode/launch.json") as file:
         json.dump(data, file, indent=4)
 
     print(f"Launch configuration for '{lib_name}' added successfully.")
@@ -151,5 +132,6 @@ if __name__ == "__main__":
     if lib_in_project(lib_name):
         set_build_config_and_packaging(lib_name)
         set_launch_config(lib_name)
+        print(write_stats.summary())
     else:
         print(f"Library '{lib_name}' is not in the project.")
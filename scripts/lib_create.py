@@ -1,10 +1,30 @@
 """ Create the directory structure for a library """
-import json
 import os
-from common import PROJECT_DATA_PATH
+from common import ask_build_options, get_project, scaffold_file, write_build_options, write_stats
+from packages import update_vcpkg_manifest, write_package_links
 
-def add_lib_to_project(lib_name: str) -> None:
-    """ Create the directory structure for a library """
+def add_lib_to_project(lib_name: str, data: dict[str, any] | None = None) -> None:
+    """ Create the directory structure for a library
+
+    data holds the optional settings of the library: the libraries it depends
+    on ("libs"), the vcpkg packages it uses ("packages"), the languages of its
+    sources ("languages", C++ only by default), "unity_build",
+    "unity_batch_size", "pch" and "bench".
+    """
+    write_lib_files(lib_name, data)
+
+    print(f"Library structure for '{lib_name}' created successfully.")
+
+    # Add the library to libs.json file in json/
+    project = get_project()
+    project.add_lib(lib_name, data)
+    project.save()
+    update_vcpkg_manifest(project)
+
+    print(f"Library '{lib_name}' added to the project.")
+
+def write_lib_files(lib_name: str, data: dict[str, any] | None = None) -> None:
+    """ Write the CMake files of a library, and its source, header and test when they are missing """
     # Define the directory structure
     dirs = [
         f"src/{lib_name}",
@@ -15,8 +35,9 @@ def add_lib_to_project(lib_name: str) -> None:
     for dir in dirs:
         os.makedirs(dir, exist_ok=True)
 
-    # Create cpp, h, and test files
-    with open(f"src/{lib_name}/{lib_name}.cpp", 'w') as file:
+    # Create cpp, h, and test files, never overwriting existing sources
+    if not os.path.exists(f"src/{lib_name}/{lib_name}.cpp"):
+        with scaffold_file(f"src/{lib_name}/{lib_name}.cpp") as file:
             file.write(f'#include "{lib_name}/{lib_name}.h"\n\n')
             file.write(f'namespace {lib_name}' + '{\n')
             file.write('bool functionNameF(const Real realV)\n')
@@ -25,63 +46,139 @@ def add_lib_to_project(lib_name: str) -> None:
             file.write('}\n')
             file.write('} '+f'// namespace {lib_name}\n')
 
-    with open(f"include/{lib_name}/{lib_name}.h", 'w') as file:
-        file.write('#pragma once\n\n')
-        file.write(f'namespace {lib_name} ' + '{\n')
-        file.write('/// @brief Example function\n')
-        file.write('///\n')
-        file.write('/// @details This function is an example of a function. It returns true if a is\n')
-        file.write('/// greater than 0, false otherwise.\n')
-        file.write('///\n')
-        file.write('/// @param aV\n')
-        file.write('/// @return true\n')
-        file.write('/// @return false\n\n')
-        file.write('using Real = float;\n\n')
-        file.write('bool functionNameF(const Real realV);\n')
-        file.write('} '+f'// namespace {lib_name}\n')
+    if not os.path.exists(f"include/{lib_name}/{lib_name}.h"):
+        with scaffold_file(f"include/{lib_name}/{lib_name}.h") as file:
+            file.write('#pragma once\n\n')
+            file.write(f'namespace {lib_name} ' + '{\n')
+            file.write('/// @brief Example function\n')
+            file.write('///\n')
+            file.write('/// @details This function is an example of a function. It returns true if a is\n')
+            file.write('/// greater than 0, false otherwise.\n')
+            file.write('///\n')
+            file.write('/// @param aV\n')
+            file.write('/// @return true\n')
+            file.write('/// @return false\n\n')
+            file.write('using Real = float;\n\n')
+            file.write('bool functionNameF(const Real realV);\n')
+            file.write('} '+f'// namespace {lib_name}\n')
 
-    with open(f"tests/{lib_name}/test_{lib_name}.cpp", 'w') as file:
+    if not os.path.exists(f"tests/{lib_name}/test_{lib_name}.cpp"):
+        with scaffold_file(f"tests/{lib_name}/test_{lib_name}.cpp") as file:
+            file.write('#include <catch2/catch_test_macros.hpp>\n')
+            file.write(f'#include <{lib_name}/{lib_name}.h>\n\n')
+            file.write(f'TEST_CASE("{lib_name}::functionName" )'+'{\n')
+            file.write(f'    REQUIRE({lib_name}::functionNameF(1.0f));\n')
+            file.write(f'    REQUIRE_FALSE({lib_name}::functionNameF(-1.0f));\n')
+            file.write('}\n')
+
+    write_lib_cmake_files(lib_name, data)
+
+def write_lib_bench_source(lib_name: str) -> None:
+    """ Write the example Catch2 benchmark of a library """
+    with scaffold_file(f"bench/{lib_name}/bench_{lib_name}.cpp") as file:
+        file.write('#include <catch2/benchmark/catch_benchmark.hpp>\n')
         file.write('#include <catch2/catch_test_macros.hpp>\n')
         file.write(f'#include <{lib_name}/{lib_name}.h>\n\n')
-        file.write(f'TEST_CASE("{lib_name}::functionName" )'+'{\n')
-        file.write(f'    REQUIRE({lib_name}::functionNameF(1.0f));\n')
-        file.write(f'    REQUIRE_FALSE({lib_name}::functionNameF(-1.0f));\n')
+        file.write(f'TEST_CASE("{lib_name}::functionName benchmark")'+'{\n')
+        file.write(f'    BENCHMARK("{lib_name}::functionNameF")'+' {\n')
+        file.write(f'        return {lib_name}::functionNameF(1.0f);\n')
+        file.write('    };\n')
         file.write('}\n')
 
+def write_lib_cuda_source(lib_name: str) -> None:
+    """ Write the example CUDA source of a library """
+    with scaffold_file(f"src/{lib_name}/{lib_name}_kernels.cu") as file:
+        file.write(f'#include "{lib_name}/{lib_name}.h"\n\n')
+        file.write(f'namespace {lib_name}' + '{\n')
+        file.write('__global__ void scaleKernelF(Real* valuesV, const Real factorV, const int countV)\n')
+        file.write('{\n')
+        file.write('    const int indexV = blockIdx.x * blockDim.x + threadIdx.x;\n')
+        file.write('    if (indexV < countV)\n')
+        file.write('        valuesV[indexV] *= factorV;\n')
+        file.write('}\n')
+        file.write('} '+f'// namespace {lib_name}\n')
+
+def write_lib_cmake_files(lib_name: str, data: dict[str, any] | None = None) -> None:
+    """ Write the CMake files and precompiled headers of a library from its settings """
+    data = data or {}
+    libs = data.get("libs", [])
     # CMakelists.txt
-    with open(f"src/{lib_name}/CMakeLists.txt", 'w') as file:
+    with scaffold_file(f"src/{lib_name}/CMakeLists.txt") as file:
         file.write('AUX_SOURCE_DIRECTORY(. DIR_LIB_SRCS)\n')
         file.write(f'AUX_SOURCE_DIRECTORY(${{PROJECT_SOURCE_DIR}}/include/{lib_name} DIR_LIB_HEADERS)\n')
         file.write(f'add_library({lib_name} ${{DIR_LIB_SRCS}} ${{DIR_LIB_HEADERS}})\n')
         file.write(f'install(TARGETS {lib_name} ARCHIVE DESTINATION lib COMPONENT {lib_name}_libs)\n')
         file.write(f'install(FILES ${{DIR_LIB_HEADERS}} DESTINATION include COMPONENT {lib_name}_headers)\n\n')
         file.write(f'target_include_directories({lib_name} PUBLIC ${{PROJECT_SOURCE_DIR}}/include)\n\n')
+        if libs:
+            file.write(f'target_link_libraries({lib_name} PUBLIC {" ".join(libs)})\n\n')
+        write_package_links(file, lib_name, data.get("packages", []), "PUBLIC")
         file.write(f'target_compile_features({lib_name} PUBLIC cxx_std_11)\n\n')
+        write_build_options(file, lib_name, data)
         file.write('source_group(\n')
         file.write('  TREE "${PROJECT_SOURCE_DIR}/include"\n')
         file.write('  PREFIX "Header Files"\n')
         file.write('  FILES ${DIR_LIB_HEADERS})\n')
 
-    with open(f"tests/{lib_name}/CMakeLists.txt", 'w') as file:
+    with scaffold_file(f"tests/{lib_name}/CMakeLists.txt") as file:
         file.write('AUX_SOURCE_DIRECTORY(. DIR_LIB_TESTS)\n')
         file.write(f'add_executable(test_{lib_name} ${{DIR_LIB_TESTS}})\n\n')
         file.write('find_package(Catch2 3 REQUIRED)\n\n')
         file.write(f'target_compile_features(test_{lib_name} PRIVATE cxx_std_17)\n\n')
         file.write(f'target_link_libraries(test_{lib_name} PRIVATE {lib_name} Catch2::Catch2WithMain)\n\n')
-        file.write(f'add_test(NAME test_{lib_name}test COMMAND test_{lib_name})\n')
+        write_build_options(file, f"test_{lib_name}", data)
+        # One CTest entry per test case, so they run and are scheduled in parallel
+        file.write('include(Catch)\n')
+        file.write(f'catch_discover_tests(test_{lib_name} TEST_PREFIX "test_{lib_name}/")\n')
+        file.write(f'project_test_costs(test_{lib_name})\n')
 
-    print(f"Library structure for '{lib_name}' created successfully.")
+    if data.get("bench"):
+        os.makedirs(f"bench/{lib_name}", exist_ok=True)
+        # The benchmark source is scaffolded once, then it belongs to the user
+        if not os.path.exists(f"bench/{lib_name}/bench_{lib_name}.cpp"):
+            write_lib_bench_source(lib_name)
+        with scaffold_file(f"bench/{lib_name}/CMakeLists.txt") as file:
+            file.write('AUX_SOURCE_DIRECTORY(. DIR_LIB_BENCHS)\n')
+            file.write(f'add_executable(bench_{lib_name} ${{DIR_LIB_BENCHS}})\n\n')
+            file.write('find_package(Catch2 3 REQUIRED)\n\n')
+            file.write(f'target_compile_features(bench_{lib_name} PRIVATE cxx_std_17)\n\n')
+            file.write(f'target_link_libraries(bench_{lib_name} PRIVATE {lib_name} Catch2::Catch2WithMain)\n')
 
-    # Add the library to libs.json file in json/
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project_data = json.load(file)
-    project_data["lib_count"] += 1
-    project_data["libs"].append(lib_name)
-    with open(PROJECT_DATA_PATH, 'w') as file:
-        json.dump(project_data, file, indent=4)
+    if "CUDA" in data.get("languages", []):
+        # Picked up by AUX_SOURCE_DIRECTORY once the manifest enables CUDA,
+        # scaffolded once like the benchmark source
+        if not os.path.exists(f"src/{lib_name}/{lib_name}_kernels.cu"):
+            write_lib_cuda_source(lib_name)
 
-    print(f"Library '{lib_name}' added to the project.")
+    # Precompiled headers, parsed once per target instead of once per source
+    if data.get("pch"):
+        with scaffold_file(f"src/{lib_name}/pch.h") as file:
+            file.write('#pragma once\n\n')
+            for lib in libs:
+                file.write(f'#include "{lib}/{lib}.h"\n')
+            file.write(f'#include "{lib_name}/{lib_name}.h"\n')
+        with scaffold_file(f"tests/{lib_name}/pch.h") as file:
+            file.write('#pragma once\n\n')
+            file.write('#include <catch2/catch_test_macros.hpp>\n')
+            file.write(f'#include <{lib_name}/{lib_name}.h>\n')
 
 if __name__ == "__main__":
     lib_name = input("Enter the name of the library: ")
-    add_lib_to_project(lib_name)
+    libs = input("Enter the libraries it depends on (space separated, empty for none): ").split()
+    packages = input("Enter the vcpkg packages it uses (space separated, empty for none): ").split()
+    for lib in libs:
+        if not get_project().has_lib(lib):
+            print(f"Library '{lib}' not found in the project. Please create the library first.")
+            exit()
+    languages = input("Enter the languages of its sources besides CXX (space separated, e.g. CUDA, empty for none): ").split()
+    data = ask_build_options()
+    if languages:
+        data["languages"] = ["CXX", *[language.upper() for language in languages if language.upper() != "CXX"]]
+    if libs:
+        data["libs"] = libs
+    if packages:
+        data["packages"] = packages
+    if input("Add a benchmark target? (y/n): ").strip().lower() == 'y':
+        data["bench"] = True
+    add_lib_to_project(lib_name, data)
+    print(write_stats.summary())
@@ -1,38 +1,47 @@
 """ Delete the directory structure for a library """
 
-import json
+import os
 import shutil
-from common import PROJECT_DATA_PATH
+from common import get_project
+from packages import update_vcpkg_manifest
 
 def lib_in_project(lib_name: str) -> bool:
     """ Check if the library is in the project """
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-    return lib_name in project['libs']
+    return get_project().has_lib(lib_name)
 
 def delete_lib_from_project(lib_name: str) -> None:
     """ Delete the directory structure for a library """
+    remove_lib_files(lib_name)
+
+    # Remove the library from the project
+    project = get_project()
+    project.remove_lib(lib_name)
+    project.save()
+    update_vcpkg_manifest(project)
+
+def remove_lib_files(lib_name: str) -> None:
+    """ Delete the source, header and test directories of a library """
     # Define the directory structure
     dirs = [
         f"src/{lib_name}",
         f"include/{lib_name}",
-        f"tests/{lib_name}"
+        f"tests/{lib_name}",
+        f"bench/{lib_name}"
     ]
     # Delete directories
     for dir in dirs:
-        shutil.rmtree(dir)
-
-    # Remove the library from the project
-    with open(PROJECT_DATA_PATH, 'r') as file:
-        project = json.load(file)
-    project['lib_count'] -= 1
-    project['libs'].remove(lib_name)
-    with open(PROJECT_DATA_PATH, 'w') as file:
-        json.dump(project, file, indent=4)
+        if os.path.isdir(dir):
+            shutil.rmtree(dir)
 
 if __name__ == "__main__":
     lib_name = input("Enter the name of the library: ")
-    if lib_in_project(lib_name):
+    apps = get_project().get_lib_apps(lib_name)
+    dependents = get_project().get_lib_dependents(lib_name)
+    if apps:
+        print(f"Library '{lib_name}' is used by {', '.join(apps)}. Please delete these applications first.")
+    elif dependents:
+        print(f"Library '{lib_name}' is linked by {', '.join(dependents)}. Please delete these libraries first.")
+    elif lib_in_project(lib_name):
         delete_lib_from_project(lib_name)
         print(f"Library structure for '{lib_name}' deleted successfully.")
     else:
@@ -0,0 +1,9 @@
+""" Generate json/project_manifest.cmake from the project data """
+
+from common import get_project
+
+if __name__ == "__main__":
+    if get_project().write_manifest():
+        print("Project manifest generated successfully.")
+    else:
+        print("Project manifest is up to date.")
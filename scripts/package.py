@@ -0,0 +1,160 @@
+""" Package the CPack components in parallel, skipping those whose installed files are unchanged """
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from common import BUILD_DIR, get_project, write_if_changed
+from presets import get_cpu_count, get_package_generator
+
+CONFIGURATION = "Release"
+# Where the package presets put the archives
+PACKAGE_DIR = "out/install"
+# Installed files and CPack trees of each component
+STAGING_DIR = "out/package"
+# Content hash and archive of each component at its last packaging, kept outside of out/
+PACKAGE_CACHE_PATH = ".cache/package_hashes.json"
+# CPack variables write_component_config overrides, left out of the settings hash
+OVERRIDDEN_VARIABLES = ("CPACK_GENERATOR", "CPACK_COMPONENTS_ALL", "CPACK_ARCHIVE_COMPONENT_INSTALL",
+                        "CPACK_PACKAGE_DIRECTORY", "CPACK_THREADS")
+
+def get_components(names: list[str]) -> list[str]:
+    """ Get the CPack components of libraries and apps """
+    project = get_project()
+    components = []
+    for name in names:
+        if project.has_lib(name):
+            components += [f"{name}_libs", f"{name}_headers"]
+        else:
+            components.append(f"{name}_apps")
+    return components
+
+def install_component(component: str) -> str:
+    """ Install a component into its staging directory and return that directory """
+    prefix = os.path.join(STAGING_DIR, component, "install")
+    shutil.rmtree(prefix, ignore_errors=True)
+    subprocess.run(["cmake", "--install", BUILD_DIR, "--config", CONFIGURATION,
+                    "--component", component, "--prefix", prefix],
+                   check=True, stdout=subprocess.DEVNULL)
+    return prefix
+
+def hash_tree(root: str) -> str:
+    """ Hash the relative paths, permissions and contents of the files of a tree """
+    digest = hashlib.sha256()
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            path = os.path.join(dir_path, file_name)
+            digest.update(os.path.relpath(path, root).replace('\\', '/').encode())
+            digest.update(str(os.stat(path).st_mode & 0o111).encode())
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(1 << 20), b''):
+                    digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_cpack_settings() -> str:
+    """ Hash the CPack configuration CMake generated, such as the package name and version
+
+    Comments and the variables package.py overrides per component are left
+    out.
+    """
+    digest = hashlib.sha256()
+    with open(os.path.join(BUILD_DIR, "CPackConfig.cmake"), 'r') as file:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#') and not line.startswith(
+                    tuple(f"set({variable} " for variable in OVERRIDDEN_VARIABLES)):
+                digest.update(line.encode() + b'\n')
+    return digest.hexdigest()
+
+def write_component_config(component: str, generator: str, threads: int) -> str:
+    """ Write a CPack configuration packaging only one component, returning its path
+
+    It is the one CMake generated, with the component list, the output
+    directory and the compression threads overridden at the end.
+    """
+    directory = os.path.abspath(os.path.join(STAGING_DIR, component))
+    with open(os.path.join(BUILD_DIR, "CPackConfig.cmake"), 'r') as file:
+        config = file.read()
+    config += (f'\nset(CPACK_GENERATOR "{generator}")\n'
+               f'set(CPACK_COMPONENTS_ALL "{component}")\n'
+               'set(CPACK_ARCHIVE_COMPONENT_INSTALL ON)\n'
+               f'set(CPACK_PACKAGE_DIRECTORY "{directory.replace(os.sep, "/")}/cpack")\n'
+               f'set(CPACK_THREADS {threads})\n')
+    path = os.path.join(directory, "CPackConfig.cmake")
+    os.makedirs(directory, exist_ok=True)
+    write_if_changed(path, config)
+    return path
+
+def package_component(component: str, generator: str, settings: str, threads: int,
+                      cached: dict[str, str] | None) -> dict[str, str]:
+    """ Package a component unless its content hash, generator and CPack settings match the cached ones
+
+    Returns the hashes, generator and archive of the component, with its
+    status: "packaged", "unchanged" when the cached archive was kept, or
+    "empty" when it installs no file.
+    """
+    prefix = install_component(component)
+    if not any(file_names for _, _, file_names in os.walk(prefix)):
+        return {"hash": None, "generator": generator, "settings": settings, "archive": None, "status": "empty"}
+    content_hash = hash_tree(prefix)
+    # A version or name change renames the archive, the cached one would be stale
+    if (cached is not None and cached["hash"] == content_hash and cached["generator"] == generator
+            and cached.get("settings") == settings and os.path.exists(cached["archive"])):
+        return {**cached, "status": "unchanged"}
+    config = write_component_config(component, generator, threads)
+    cpack_dir = os.path.join(STAGING_DIR, component, "cpack")
+    shutil.rmtree(cpack_dir, ignore_errors=True)
+    subprocess.run(["cpack", "--config", config, "-C", CONFIGURATION], check=True, stdout=subprocess.DEVNULL)
+    archives = [path for path in glob.glob(os.path.join(cpack_dir, "*")) if os.path.isfile(path)]
+    os.makedirs(PACKAGE_DIR, exist_ok=True)
+    archive = os.path.join(PACKAGE_DIR, os.path.basename(archives[0]))
+    os.replace(archives[0], archive)
+    return {"hash": content_hash, "generator": generator, "settings": settings, "archive": archive,
+            "status": "packaged"}
+
+def package_components(components: list[str], generator: str, workers: int | None = None) -> dict[str, dict[str, str]]:
+    """ Package components in parallel, updating the cache of their content hashes
+
+    The cores are shared between the components packaged at the same time,
+    each one compressing with its share.
+    """
+    cache = {}
+    if os.path.exists(PACKAGE_CACHE_PATH):
+        with open(PACKAGE_CACHE_PATH, 'r') as file:
+            cache = json.load(file)
+    workers = max(1, min(workers or get_cpu_count(), len(components)))
+    threads = max(1, get_cpu_count() // workers)
+    settings = hash_cpack_settings()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = dict(zip(components, executor.map(
+            lambda component: package_component(component, generator, settings, threads, cache.get(component)),
+            components)))
+    for component, result in results.items():
+        cache[component] = {key: value for key, value in result.items() if key != "status"}
+    os.makedirs(os.path.dirname(PACKAGE_CACHE_PATH), exist_ok=True)
+    write_if_changed(PACKAGE_CACHE_PATH, json.dumps(cache, indent=4) + "\n")
+    return results
+
+if __name__ == "__main__":
+    project = get_project()
+    names = input("Enter the names of the libraries and apps to package (space separated, empty for all): ").split()
+    names = names or [*project.libs, *project.apps]
+    missing = [name for name in names if not project.has_lib(name) and not project.has_app(name)]
+    if missing:
+        print(f"'{missing[0]}' is neither a library nor an application of the project.")
+    elif not names:
+        print("There is nothing to package in the project.")
+    else:
+        with open("CMakeUserPresets.json", 'r') as file:
+            generator = get_package_generator(json.load(file))
+        subprocess.run(["cmake", "--build", BUILD_DIR, "--config", CONFIGURATION, "--target", *names], check=True)
+        results = package_components(get_components(names), generator)
+        for component, result in results.items():
+            print(f"{component:<40} {result['status']:<10} {result['archive'] or '-'}")
+        packaged = sum(result["status"] == "packaged" for result in results.values())
+        unchanged = sum(result["status"] == "unchanged" for result in results.values())
+        print(f"{packaged} component(s) packaged, {unchanged} unchanged.")
@@ -0,0 +1,68 @@
+""" Per-target vcpkg packages: their CMake packages and targets, and the minimal vcpkg.json """
+
+import io
+import json
+from common import ProjectModel, get_project, write_if_changed
+
+VCPKG_MANIFEST_PATH = "vcpkg.json"
+# Packages every project needs, Catch2 for the tests and benchmarks
+BASE_PACKAGES = ["catch2"]
+# CMake package and target of the vcpkg ports not following the boost-<name> or <name>::<name> patterns
+KNOWN_PACKAGES = {
+    "boost": ("Boost", "Boost::boost"),
+    "catch2": ("Catch2", "Catch2::Catch2"),
+    "eigen3": ("Eigen3", "Eigen3::Eigen"),
+    "gtest": ("GTest", "GTest::gtest"),
+    "nlohmann-json": ("nlohmann_json", "nlohmann_json::nlohmann_json"),
+    "openssl": ("OpenSSL", "OpenSSL::SSL"),
+    "tbb": ("TBB", "TBB::tbb"),
+    "zlib": ("ZLIB", "ZLIB::ZLIB")
+}
+
+def get_package_cmake(port: str) -> tuple[str, str]:
+    """ Get the CMake package to find and the target to link for a vcpkg port """
+    if port in KNOWN_PACKAGES:
+        return KNOWN_PACKAGES[port]
+    if port.startswith("boost-"):
+        # vcpkg installs a config package per boost library, boost_charconv for boost-charconv
+        component = port[len("boost-"):].replace("-", "_")
+        return f"boost_{component}", f"Boost::{component}"
+    return port, f"{port}::{port}"
+
+def write_package_links(file: io.TextIOBase, target: str, packages: list[str], scope: str) -> None:
+    """ Write the find_package and target_link_libraries lines of the packages a target uses """
+    if not packages:
+        return
+    for port in packages:
+        file.write(f'find_package({get_package_cmake(port)[0]} CONFIG REQUIRED)\n')
+    targets = " ".join(get_package_cmake(port)[1] for port in packages)
+    file.write(f'target_link_libraries({target} {scope} {targets})\n\n')
+
+def get_project_packages(project: ProjectModel) -> list[str]:
+    """ Get the union of the packages used by the libraries and apps, each listed once """
+    packages = dict.fromkeys(BASE_PACKAGES)
+    for lib in project.libs:
+        packages.update(dict.fromkeys(project.get_lib_data(lib).get("packages", [])))
+    for app in project.apps:
+        packages.update(dict.fromkeys(project.get_app_data(app).get("packages", [])))
+    return list(packages)
+
+def update_vcpkg_manifest(project: ProjectModel) -> bool:
+    """ Reduce the dependencies of vcpkg.json to the packages the targets use
+
+    The version constraints of the dependencies already listed and the
+    overrides are kept. Returns True if vcpkg.json changed.
+    """
+    with open(VCPKG_MANIFEST_PATH, 'r') as file:
+        manifest = json.load(file)
+    existing = {}
+    for dependency in manifest.get("dependencies", []):
+        existing[dependency if isinstance(dependency, str) else dependency["name"]] = dependency
+    manifest["dependencies"] = [existing.get(port, port) for port in get_project_packages(project)]
+    return write_if_changed(VCPKG_MANIFEST_PATH, json.dumps(manifest, indent=2) + "\n")
+
+if __name__ == "__main__":
+    if update_vcpkg_manifest(get_project()):
+        print(f"{VCPKG_MANIFEST_PATH} updated.")
+    else:
+        print(f"{VCPKG_MANIFEST_PATH} is up to date.")
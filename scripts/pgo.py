@@ -0,0 +1,170 @@
+""" Build an app with profile-guided optimization and compare its runtime with plain Release """
+
+import glob
+import json
+import os
+import shutil
+import subprocess
+import time
+from app_config import get_targets
+from bench_run import CONFIGURATION, RESULTS_DIR, compare_results, format_report, get_bench_path, get_commit, run_bench
+from common import BUILD_DIR, get_project, write_if_changed, write_stats
+from presets import merge_presets, update_user_presets
+
+# The instrumented and the optimized builds share a tree, GCC matches profiles by object path
+PGO_BUILD_DIR = "out/pgo"
+PGO_PROFILES_DIR = f"{PGO_BUILD_DIR}/pgo-profiles"
+# Runs of the training command timed for the report, the best one is kept
+REPEATS = 3
+
+def get_app_path(app_name: str, build_dir: str) -> str:
+    """ Get the executable of an app in a Ninja Multi-Config build tree """
+    suffix = ".exe" if os.name == 'nt' else ""
+    return f"{build_dir}/apps/{app_name}/{CONFIGURATION}/{app_name}{suffix}"
+
+def create_pgo_presets(app_name: str) -> tuple[list[dict[str, any]], list[dict[str, any]]]:
+    """ Create the configure and build presets of the instrumented and optimized builds """
+    configure_presets = [
+        {
+            "name": f"pgo-{phase.lower()}-config",
+            "inherits": "default-config",
+            "binaryDir": f"${{sourceDir}}/{PGO_BUILD_DIR}/",
+            "cacheVariables": {
+                "PROJECT_PGO": phase
+            }
+        }
+        for phase in ("GENERATE", "USE")
+    ]
+    build_presets = [
+        {
+            "name": f"{app_name}-pgo-{phase}-build",
+            "configurePreset": f"pgo-{phase}-config",
+            "inherits": "release-build",
+            "targets": get_targets([app_name])
+        }
+        for phase in ("generate", "use")
+    ]
+    return configure_presets, build_presets
+
+def set_pgo_presets(app_name: str) -> None:
+    """ Add the PGO presets of an app to the CMakeUserPresets.json file """
+    configure_presets, build_presets = create_pgo_presets(app_name)
+    def add_presets(cmake_presets: dict[str, any]) -> None:
+        cmake_presets["configurePresets"] = merge_presets(cmake_presets.get("configurePresets", []),
+                                                          configure_presets)
+        cmake_presets["buildPresets"] = merge_presets(cmake_presets.get("buildPresets", []), build_presets)
+    update_user_presets(add_presets)
+
+def get_compiler_id(build_dir: str) -> str:
+    """ Read the C++ compiler of a configured build tree """
+    with open(f"{build_dir}/CMakeCache.txt", 'r') as file:
+        for line in file:
+            if line.startswith("CMAKE_CXX_COMPILER_ID:"):
+                return line.split("=", 1)[1].strip()
+    return ""
+
+def merge_profiles(compiler_id: str) -> None:
+    """ Merge the raw profiles of the training runs into what the optimized build reads
+
+    GCC reads its .gcda files directly, and the MSVC linker merges the .pgc
+    files into their .pgd when it sees /USEPROFILE.
+    """
+    if "Clang" in compiler_id:
+        subprocess.run(["llvm-profdata", "merge", f"--output={PGO_PROFILES_DIR}/default.profdata",
+                        *glob.glob(f"{PGO_PROFILES_DIR}/*.profraw")], check=True)
+
+def get_bench_libs(app_name: str) -> list[str]:
+    """ Get the libraries of the app that have a benchmark target """
+    project = get_project()
+    return [lib for lib in project.get_lib_closure(project.get_app_libs(app_name))
+            if project.get_lib_data(lib).get("bench")]
+
+def run_training(app_name: str, build_dir: str, command: str | None, repeats: int = 1) -> float:
+    """ Run the training workload against a build tree and return its best wall time in seconds
+
+    "{app}" in the command is replaced with the path of the app executable.
+    Without a command, the benchmarks of the app libraries run instead, or
+    the app itself when there are none.
+    """
+    if command:
+        commands = [command.replace("{app}", get_app_path(app_name, build_dir))]
+    else:
+        commands = [f'"{get_bench_path(lib, build_dir)}"' for lib in get_bench_libs(app_name)]
+        commands = commands or [f'"{get_app_path(app_name, build_dir)}"']
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for line in commands:
+            subprocess.run(line, shell=True, check=True, stdout=subprocess.DEVNULL)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def build_pgo(app_name: str, command: str | None) -> None:
+    """ Instrument, train, merge the profiles and rebuild optimized """
+    shutil.rmtree(PGO_PROFILES_DIR, ignore_errors=True)
+    os.makedirs(PGO_PROFILES_DIR)
+    subprocess.run(["cmake", "--preset", "pgo-generate-config"], check=True)
+    subprocess.run(["cmake", "--build", "--preset", f"{app_name}-pgo-generate-build"], check=True)
+    # A single run records the profile, the instrumented build is not timed
+    run_training(app_name, PGO_BUILD_DIR, command)
+    merge_profiles(get_compiler_id(PGO_BUILD_DIR))
+    subprocess.run(["cmake", "--preset", "pgo-use-config"], check=True)
+    subprocess.run(["cmake", "--build", "--preset", f"{app_name}-pgo-use-build"], check=True)
+
+def build_release(app_name: str) -> None:
+    """ Build the app in plain Release, the reference of the report """
+    if not os.path.exists(f"{BUILD_DIR}/CMakeCache.txt"):
+        subprocess.run(["cmake", "--preset", "default-config"], check=True)
+    subprocess.run(["cmake", "--build", BUILD_DIR, "--config", CONFIGURATION,
+                    "--target", *get_targets([app_name])], check=True)
+
+def compare_runtime(app_name: str, command: str | None) -> dict[str, any]:
+    """ Compare the PGO build with plain Release on the training workload
+
+    The Catch2 statistics are compared when the benchmarks are the workload,
+    the best wall time of the command otherwise.
+    """
+    if not command and get_bench_libs(app_name):
+        release = {}
+        optimized = {}
+        for lib in get_bench_libs(app_name):
+            release.update(run_bench(lib, BUILD_DIR))
+            optimized.update(run_bench(lib, PGO_BUILD_DIR))
+        return {"release": release, "pgo": optimized}
+    release_time = run_training(app_name, BUILD_DIR, command, REPEATS)
+    pgo_time = run_training(app_name, PGO_BUILD_DIR, command, REPEATS)
+    return {"release_time_s": release_time, "pgo_time_s": pgo_time}
+
+def format_runtime_report(app_name: str, comparison: dict[str, any]) -> str:
+    """ Format the comparison with plain Release """
+    if "release" in comparison:
+        return format_report(f"{app_name} with PGO against plain Release",
+                             compare_results(comparison["release"], comparison["pgo"]))
+    release_time = comparison["release_time_s"]
+    pgo_time = comparison["pgo_time_s"]
+    return (f"{app_name} training workload, best of {REPEATS} run(s)\n"
+            f"{'Release':<10} {release_time:>9.3f}s\n"
+            f"{'PGO':<10} {pgo_time:>9.3f}s {release_time / pgo_time:>7.2f}x\n")
+
+if __name__ == "__main__":
+    app_name = input("Enter the name of the app: ")
+    project = get_project()
+    if not project.has_app(app_name):
+        print(f"Application '{app_name}' is not in the project.")
+        exit()
+    stored = project.get_app_data(app_name).get("pgo_training")
+    command = input(f"Enter the training command, {{app}} being the executable (empty for "
+                    f"{'the stored one' if stored else 'the benchmarks'}): ") or stored
+    if command != stored:
+        project.set_app_data(app_name, "pgo_training", command)
+        project.save()
+
+    set_pgo_presets(app_name)
+    build_pgo(app_name, command)
+    build_release(app_name)
+    comparison = compare_runtime(app_name, command)
+    commit = get_commit()
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    write_if_changed(f"{RESULTS_DIR}/pgo-{app_name}-{commit}.json", json.dumps(comparison, indent=4) + "\n")
+    print(format_runtime_report(app_name, comparison), end="")
+    print(write_stats.summary())
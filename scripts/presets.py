@@ -0,0 +1,304 @@
+""" Shared helpers for the generated CMakeUserPresets.json """
+
+import json
+import os
+import platform
+import shutil
+from collections.abc import Callable
+from common import get_project, scaffold_file
+
+USER_PRESETS_PATH = "CMakeUserPresets.json"
+# Key of the per-host settings kept in the "vendor" map of CMakeUserPresets.json
+VENDOR_KEY = "project-scripts"
+# Rough peak memory of one compiler process, in MiB
+COMPILE_MEMORY_MB = 1024
+# Rough peak memory of a link, in MiB, plus the share of each linked library
+LINK_MEMORY_MB = 1024
+LINK_MEMORY_PER_LIB_MB = 256
+# Memory left to the rest of the system, in MiB
+RESERVED_MEMORY_MB = 2048
+# Compiler launchers, in order of preference
+COMPILER_LAUNCHERS = ["ccache", "sccache"]
+# Compiler cache kept outside of out/ so it survives reset.py
+COMPILER_CACHE_DIR = ".cache/compiler"
+# Per-compilation counters written by ccache, read by cache_report.py
+CCACHE_STATS_LOG = ".cache/ccache-stats.log"
+# vcpkg binary packages, one directory per triplet, kept outside of out/ so they survive reset.py
+VCPKG_BINARY_CACHE_DIR = ".cache/vcpkg"
+# Linux compilers, in order of preference, with the hidden preset selecting them
+LINUX_COMPILERS = {"gcc": "g++", "clang": "clang++"}
+# Fast linkers, in order of preference, with their CMAKE_LINKER_TYPE
+LINKERS = {"mold": ("mold", "MOLD"), "lld": ("ld.lld", "LLD")}
+# CPack archive generator of the packages, zstd compresses about as well as gzip many times faster
+PACKAGE_GENERATOR = "TZST"
+
+def get_cpu_count() -> int:
+    """ Get the number of cores this process may run on """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def get_memory_mb() -> int | None:
+    """ Get the physical memory of the host in MiB, None if it can't be found """
+    if os.name == 'nt':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [
+                ("dwLength", ctypes.c_ulong),
+                ("dwMemoryLoad", ctypes.c_ulong),
+                ("ullTotalPhys", ctypes.c_ulonglong),
+                ("ullAvailPhys", ctypes.c_ulonglong),
+                ("ullTotalPageFile", ctypes.c_ulonglong),
+                ("ullAvailPageFile", ctypes.c_ulonglong),
+                ("ullTotalVirtual", ctypes.c_ulonglong),
+                ("ullAvailVirtual", ctypes.c_ulonglong),
+                ("sullAvailExtendedVirtual", ctypes.c_ulonglong)
+            ]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return None
+        return status.ullTotalPhys // (1024 * 1024)
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def get_link_memory_mb() -> int:
+    """ Estimate the peak memory of the heaviest link target of the project """
+    project = get_project()
+    # Tests link their library and Catch2
+    estimate = LINK_MEMORY_MB + 2 * LINK_MEMORY_PER_LIB_MB
+    for app_name in project.apps:
+        lib_count = len(project.get_app_libs(app_name))
+        estimate = max(estimate, LINK_MEMORY_MB + lib_count * LINK_MEMORY_PER_LIB_MB)
+    return estimate
+
+def get_parallelism(cmake_presets: dict[str, any] | None = None) -> dict[str, int]:
+    """ Size the compile, link and test jobs from the cores and memory of the host
+
+    Values set in the "vendor" map of CMakeUserPresets.json take precedence:
+    "vendor": {"project-scripts": {"compile_jobs": 32, "link_jobs": 4, "test_jobs": 16}}
+    """
+    cpu_count = get_cpu_count()
+    memory_mb = get_memory_mb()
+    if memory_mb is None:
+        compile_jobs = cpu_count
+        link_jobs = max(1, cpu_count // 4)
+    else:
+        usable_mb = max(memory_mb - RESERVED_MEMORY_MB, COMPILE_MEMORY_MB)
+        compile_jobs = max(1, min(cpu_count, usable_mb // COMPILE_MEMORY_MB))
+        link_jobs = max(1, min(cpu_count, usable_mb // get_link_memory_mb()))
+    overrides = (cmake_presets or {}).get("vendor", {}).get(VENDOR_KEY, {})
+    return {
+        "compile": overrides.get("compile_jobs", compile_jobs),
+        "link": overrides.get("link_jobs", link_jobs),
+        # Tests are bounded like compilations, by cores and memory
+        "test": overrides.get("test_jobs", compile_jobs)
+    }
+
+def apply_parallelism(cmake_presets: dict[str, any]) -> None:
+    """ Set the job counts, the Ninja job pools and the parallel tests in the presets """
+    jobs = get_parallelism(cmake_presets)
+    for preset in cmake_presets.get("configurePresets", []):
+        if preset["name"] == "default-config":
+            cache_variables = preset.setdefault("cacheVariables", {})
+            cache_variables["PROJECT_COMPILE_JOBS"] = str(jobs["compile"])
+            cache_variables["PROJECT_LINK_JOBS"] = str(jobs["link"])
+    for preset in cmake_presets.get("buildPresets", []):
+        if preset["name"] == "common-build":
+            preset["jobs"] = jobs["compile"]
+    for preset in cmake_presets.get("testPresets", []):
+        if preset["name"] == "common-test":
+            preset.setdefault("execution", {})["jobs"] = jobs["test"]
+
+def merge_presets(existing: list[dict[str, any]], new: list[dict[str, any]]) -> list[dict[str, any]]:
+    """ Replace the presets having the same name and append the other new ones """
+    presets = {preset["name"]: preset for preset in existing}
+    for preset in new:
+        presets[preset["name"]] = preset
+    return list(presets.values())
+
+def get_compiler_launcher(cmake_presets: dict[str, any] | None = None) -> str | None:
+    """ Get the compiler cache to use, None if there is none
+
+    The "compiler_launcher" value of the "vendor" map of CMakeUserPresets.json
+    selects one explicitly, "none" disables it.
+    """
+    overrides = (cmake_presets or {}).get("vendor", {}).get(VENDOR_KEY, {})
+    if "compiler_launcher" in overrides:
+        launcher = overrides["compiler_launcher"]
+        return None if launcher == "none" else launcher
+    for launcher in COMPILER_LAUNCHERS:
+        if shutil.which(launcher):
+            return launcher
+    return None
+
+def get_launcher_command(launcher: str) -> str:
+    """ Get the compiler launcher command, setting the cache directory and stats log itself
+
+    A configure preset's environment doesn't reach the later `cmake --build`
+    runs, so the launcher carries its settings through `cmake -E env`.
+    """
+    cmake = (shutil.which("cmake") or "cmake").replace('\\', '/')
+    if launcher == "ccache":
+        settings = [f"CCACHE_DIR=${{sourceDir}}/{COMPILER_CACHE_DIR}",
+                    f"CCACHE_STATSLOG=${{sourceDir}}/{CCACHE_STATS_LOG}"]
+    elif launcher == "sccache":
+        settings = [f"SCCACHE_DIR=${{sourceDir}}/{COMPILER_CACHE_DIR}"]
+    else:
+        return launcher
+    return ";".join([cmake, "-E", "env", *settings, (shutil.which(launcher) or launcher).replace('\\', '/')])
+
+def apply_compiler_cache(cmake_presets: dict[str, any]) -> None:
+    """ Set the compiler launcher, with its cache directory, in the presets """
+    launcher = get_compiler_launcher(cmake_presets)
+    for preset in cmake_presets.get("configurePresets", []):
+        if preset["name"] != "default-config":
+            continue
+        cache_variables = preset.setdefault("cacheVariables", {})
+        for language in ("C", "CXX", "CUDA"):
+            cache_variables.pop(f"CMAKE_{language}_COMPILER_LAUNCHER", None)
+        # Set by earlier versions, where only the configure saw them
+        environment = preset.get("environment", {})
+        for variable in ("CCACHE_DIR", "CCACHE_STATSLOG", "SCCACHE_DIR"):
+            environment.pop(variable, None)
+        if not environment:
+            preset.pop("environment", None)
+        if launcher is None:
+            continue
+        for language in ("C", "CXX", "CUDA"):
+            cache_variables[f"CMAKE_{language}_COMPILER_LAUNCHER"] = get_launcher_command(launcher)
+
+def get_vcpkg_binary_cache(cmake_presets: dict[str, any], triplet: str) -> str | None:
+    """ Get the directory of the vcpkg binary packages of a triplet, None if there is none
+
+    The "vcpkg_binary_cache" value of the "vendor" map of CMakeUserPresets.json
+    sets another root directory, shared between checkouts for instance, "none"
+    disables the cache.
+    """
+    overrides = cmake_presets.get("vendor", {}).get(VENDOR_KEY, {})
+    root = overrides.get("vcpkg_binary_cache", f"${{sourceDir}}/{VCPKG_BINARY_CACHE_DIR}")
+    if root == "none":
+        return None
+    if "vcpkg_binary_cache" not in overrides:
+        os.makedirs(f"{VCPKG_BINARY_CACHE_DIR}/{triplet}", exist_ok=True)
+    return f"{root}/{triplet}"
+
+def apply_vcpkg_binary_cache(cmake_presets: dict[str, any]) -> None:
+    """ Point vcpkg at a local files binary cache in the presets
+
+    vcpkg names each package after its ABI hash, which covers the manifest
+    versions and overrides, the port files, the triplet and the compiler, so a
+    package is only restored when it would be built the same way.
+    """
+    for preset in cmake_presets.get("configurePresets", []):
+        if preset["name"] != "default-config":
+            continue
+        environment = preset.setdefault("environment", {})
+        environment.pop("VCPKG_BINARY_SOURCES", None)
+        triplet = preset.get("cacheVariables", {}).get("VCPKG_TARGET_TRIPLET", "default")
+        cache_dir = get_vcpkg_binary_cache(cmake_presets, triplet)
+        if cache_dir is not None:
+            environment["VCPKG_BINARY_SOURCES"] = f"clear;files,{cache_dir},readwrite"
+
+def get_linux_compiler(cmake_presets: dict[str, any] | None = None) -> str:
+    """ Get the compiler family of the Linux configure preset, gcc or clang
+
+    The "compiler" value of the "vendor" map of CMakeUserPresets.json
+    selects one explicitly.
+    """
+    overrides = (cmake_presets or {}).get("vendor", {}).get(VENDOR_KEY, {})
+    if overrides.get("compiler") in LINUX_COMPILERS:
+        return overrides["compiler"]
+    for compiler, executable in LINUX_COMPILERS.items():
+        if shutil.which(executable):
+            return compiler
+    return "gcc"
+
+def create_linux_config(cmake_presets: dict[str, any] | None = None) -> dict[str, any]:
+    """ Create the default configure preset of a Linux host """
+    triplet = "arm64-linux" if platform.machine() in ("aarch64", "arm64") else "x64-linux"
+    return {
+        "name": "default-config",
+        "inherits": f"conf-linux-{get_linux_compiler(cmake_presets)}",
+        "generator": "Ninja Multi-Config",
+        "cacheVariables": {
+            "CMAKE_TOOLCHAIN_FILE": "$env{VCPKG_ROOT}/scripts/buildsystems/vcpkg.cmake",
+            "VCPKG_TARGET_TRIPLET": triplet
+        }
+    }
+
+def get_linker(cmake_presets: dict[str, any] | None = None) -> str | None:
+    """ Get the CMAKE_LINKER_TYPE of the fastest linker installed, None for the default one
+
+    The "linker" value of the "vendor" map of CMakeUserPresets.json selects
+    one explicitly, "mold" or "lld", "default" keeps the one of the compiler.
+    """
+    overrides = (cmake_presets or {}).get("vendor", {}).get(VENDOR_KEY, {})
+    if "linker" in overrides:
+        return LINKERS[overrides["linker"]][1] if overrides["linker"] in LINKERS else None
+    for executable, linker_type in LINKERS.values():
+        if shutil.which(executable):
+            return linker_type
+    return None
+
+def apply_linker(cmake_presets: dict[str, any]) -> None:
+    """ Set the linker in the Linux configure presets, MSVC keeps link.exe """
+    linker_type = get_linker(cmake_presets)
+    for preset in cmake_presets.get("configurePresets", []):
+        if preset["name"] != "default-config":
+            continue
+        cache_variables = preset.setdefault("cacheVariables", {})
+        cache_variables.pop("CMAKE_LINKER_TYPE", None)
+        if linker_type is not None and preset.get("inherits", "").startswith("conf-linux"):
+            cache_variables["CMAKE_LINKER_TYPE"] = linker_type
+
+def get_package_generator(cmake_presets: dict[str, any] | None = None) -> str:
+    """ Get the CPack generator of the packages
+
+    The "package_generator" value of the "vendor" map of CMakeUserPresets.json
+    selects another one, TXZ for smaller archives or TGZ for older tools.
+    """
+    overrides = (cmake_presets or {}).get("vendor", {}).get(VENDOR_KEY, {})
+    return overrides.get("package_generator", PACKAGE_GENERATOR)
+
+def apply_package_generator(cmake_presets: dict[str, any]) -> None:
+    """ Set the generator and its compression threads in the package presets """
+    for preset in cmake_presets.get("packagePresets", []):
+        if preset["name"] == "default-package":
+            preset["generators"] = [get_package_generator(cmake_presets)]
+            # Used by the TXZ and TZST generators
+            preset.setdefault("variables", {})["CPACK_THREADS"] = str(get_cpu_count())
+
+def apply_host_settings(cmake_presets: dict[str, any]) -> None:
+    """ Set everything that depends on the host in the presets: jobs, caches, linker and packaging """
+    apply_parallelism(cmake_presets)
+    apply_compiler_cache(cmake_presets)
+    apply_vcpkg_binary_cache(cmake_presets)
+    apply_linker(cmake_presets)
+    apply_package_generator(cmake_presets)
+
+def load_user_presets() -> dict[str, any]:
+    """ Read the CMakeUserPresets.json file """
+    with open(USER_PRESETS_PATH, 'r') as file:
+        return json.load(file)
+
+def write_user_presets(cmake_presets: dict[str, any]) -> None:
+    """ Apply the host settings to the presets and write them to CMakeUserPresets.json if they changed """
+    apply_host_settings(cmake_presets)
+    with scaffold_file(USER_PRESETS_PATH) as file:
+        json.dump(cmake_presets, file, indent=4)
+
+def update_user_presets(mutator: Callable[[dict[str, any]], None]) -> dict[str, any]:
+    """ Read CMakeUserPresets.json, let mutator change the presets in place, then write them back
+
+    The host settings are applied after mutator, so every script leaves the
+    file sized and cached for this host. Returns the written presets.
+    """
+    cmake_presets = load_user_presets()
+    mutator(cmake_presets)
+    write_user_presets(cmake_presets)
+    return cmake_presets
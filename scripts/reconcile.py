@@ -0,0 +1,119 @@
+""" Reconcile the project with a declarative spec of its libraries and applications """
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from common import get_project, write_stats
+from lib_create import write_lib_cmake_files, write_lib_files
+from lib_delete import remove_lib_files
+from app_create import write_app_cmake_files, write_app_files
+from app_delete import remove_app_files
+from packages import update_vcpkg_manifest
+
+LIB_DIRS = ["src", "include", "tests"]
+
+def load_spec(spec_path: str) -> dict[str, any]:
+    """ Load the desired state of the project
+
+    The spec lists the libraries, by name or with their settings, and the
+    applications with their libraries and settings:
+    {"libs": ["lib_a", {"name": "lib_b", "libs": ["lib_a"], "packages": ["boost-charconv"]}],
+     "apps": [{"name": "app", "libs": ["lib_b"], "pch": true}]}
+    """
+    with open(spec_path, 'r') as file:
+        spec = json.load(file)
+    libs = {}
+    for lib in spec.get("libs", []):
+        if isinstance(lib, str):
+            libs[lib] = {}
+        else:
+            libs[lib["name"]] = {key: value for key, value in lib.items() if key != "name"}
+            if not libs[lib["name"]].get("libs"):
+                libs[lib["name"]].pop("libs", None)
+    apps = {}
+    for app in spec.get("apps", []):
+        apps[app["name"]] = {key: value for key, value in app.items() if key != "name"}
+    return {"libs": libs, "apps": apps}
+
+def lib_files_exist(lib_name: str) -> bool:
+    """ Check if the directories of a library are present in the tree """
+    return all(os.path.isdir(f"{folder}/{lib_name}") for folder in LIB_DIRS)
+
+def get_app_settings(data: dict[str, any]) -> dict[str, any]:
+    """ Get the settings of an application spec, without its libraries """
+    return {key: value for key, value in data.items() if key != "libs"}
+
+def diff_project(spec: dict[str, any]) -> dict[str, list]:
+    """ Compute the creations and deletions needed to reach the spec """
+    project = get_project()
+    wanted_libs = spec["libs"]
+    plan = {
+        # A library missing some of its files only gets those, existing sources are kept
+        "create_libs": [(lib, data) for lib, data in spec["libs"].items()
+                        if not project.has_lib(lib) or not lib_files_exist(lib)],
+        # Settings changes only regenerate the CMake files, keeping the sources
+        "update_libs": [(lib, data) for lib, data in spec["libs"].items()
+                        if project.has_lib(lib) and lib_files_exist(lib)
+                        and project.get_lib_data(lib) != data],
+        "delete_libs": [lib for lib in project.libs if lib not in wanted_libs],
+        "create_apps": [(app, data) for app, data in spec["apps"].items()
+                        if not project.has_app(app) or not os.path.isdir(f"apps/{app}")],
+        "update_apps": [(app, data) for app, data in spec["apps"].items()
+                        if project.has_app(app) and os.path.isdir(f"apps/{app}")
+                        and (project.get_app_libs(app) != data["libs"]
+                             or project.get_app_data(app) != get_app_settings(data))],
+        "delete_apps": [app for app in project.apps if app not in spec["apps"]]
+    }
+    # Check the spec is consistent before touching anything
+    for lib, data in spec["libs"].items():
+        missing = [dep for dep in data.get("libs", []) if dep not in wanted_libs]
+        if missing:
+            raise ValueError(f"Library '{lib}' depends on unknown libraries: {', '.join(missing)}")
+    for app, data in spec["apps"].items():
+        missing = [lib for lib in data["libs"] if lib not in wanted_libs]
+        if missing:
+            raise ValueError(f"Application '{app}' uses unknown libraries: {', '.join(missing)}")
+    return plan
+
+def apply_plan(plan: dict[str, list], max_workers: int | None = None) -> None:
+    """ Apply the plan, writing the files in parallel and the project data once """
+    project = get_project()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Deletions first so a recreated item starts from a clean directory
+        jobs = [executor.submit(remove_app_files, app) for app in plan["delete_apps"]]
+        jobs += [executor.submit(remove_lib_files, lib) for lib in plan["delete_libs"]]
+        for job in jobs:
+            job.result()
+        jobs = [executor.submit(write_lib_files, lib, data) for lib, data in plan["create_libs"]]
+        jobs += [executor.submit(write_lib_cmake_files, lib, data) for lib, data in plan["update_libs"]]
+        jobs += [executor.submit(write_app_files, app, data["libs"], get_app_settings(data))
+                 for app, data in plan["create_apps"]]
+        jobs += [executor.submit(write_app_cmake_files, app, data["libs"], get_app_settings(data))
+                 for app, data in plan["update_apps"]]
+        for job in jobs:
+            job.result()
+
+    for app in plan["delete_apps"]:
+        project.remove_app(app)
+    for lib in plan["delete_libs"]:
+        project.remove_lib(lib)
+    for lib, data in plan["create_libs"] + plan["update_libs"]:
+        project.add_lib(lib, data)
+    for app, data in plan["create_apps"] + plan["update_apps"]:
+        project.add_app(app, data["libs"], get_app_settings(data))
+    project.save()
+    update_vcpkg_manifest(project)
+
+if __name__ == "__main__":
+    spec_path = input("Enter the path of the project spec: ")
+    try:
+        plan = diff_project(load_spec(spec_path))
+    except ValueError as error:
+        print(error)
+        exit()
+    apply_plan(plan)
+    print(f"Libraries created: {len(plan['create_libs'])}, updated: {len(plan['update_libs'])}, "
+          f"deleted: {len(plan['delete_libs'])}.")
+    print(f"Applications created: {len(plan['create_apps'])}, updated: {len(plan['update_apps'])}, "
+          f"deleted: {len(plan['delete_apps'])}.")
+    print(write_stats.summary())
@@ -1,12 +1,26 @@
 """ Script to reset the project to its initial state """
 
 import os
-import shutil
 import json
+from common import scaffold_file
+from presets import COMPILER_CACHE_DIR, VENDOR_KEY, create_linux_config, write_user_presets
+from trash import (TRASH_LOG, empty_trash, empty_trash_in_background, format_size, move_to_trash, print_failures,
+                   restore_from_trash)
 
 # Define paths
 out_path = "out/"
-folders_to_clear = ["apps/", "include/", "src/", "tests/"]
+folders_to_clear = ["apps/", "include/", "src/", "tests/", "bench/"]
+# Expensive state that can survive a reset
+paths_to_keep = {
+    "vcpkg installed packages": "out/build/vcpkg_installed",
+    "compiler cache": COMPILER_CACHE_DIR,
+    "generated docs": "out/build/docs"
+}
+files_to_delete = [
+    "json/project_data.journal",
+    "json/project_data.cache",
+    "json/project_manifest.cmake"
+]
 files_to_reset = {
     "CMakeUserPresets.json": {
         "version": 8,
@@ -19,8 +33,7 @@ files_to_reset = {
                     "CMAKE_TOOLCHAIN_FILE": "$env{VCPKG_ROOT}/scripts/buildsystems/vcpkg.cmake",
                     "VCPKG_TARGET_TRIPLET": "x64-windows",
                     "CMAKE_C_COMPILER": "cl.exe",
-                    "CMAKE_CXX_COMPILER": "cl.exe",
-                    "CMAKE_CUDA_COMPILER": "C:/Users/Name/NVIDIA_Toolkit/CUDA/bin/nvcc.exe"
+                    "CMAKE_CXX_COMPILER": "cl.exe"
                 },
                 "environment": {
                     "VCPKG_ROOT": "C:/Users/Name/repositories/vcpkg"
@@ -31,7 +44,6 @@ files_to_reset = {
             {
                 "name": "common-build",
                 "configurePreset": "default-config",
-                "jobs": 6,
                 "hidden": True
             },
             {
@@ -94,7 +106,7 @@ files_to_reset = {
                 "displayName": "default-package",
                 "configurePreset": "default-config",
                 "generators": [
-                    "TGZ"
+                    "TZST"
                 ],
                 "output": {
                     "debug": False,
@@ -112,26 +124,63 @@ files_to_reset = {
         "lib_count": -1,
         "libs": [],
         "app_count": -1,
-        "apps": []
+        "apps": [],
+        "lib_data": {}
     }
 }
 
-# Delete out/ folder and everything inside
-if os.path.exists(out_path):
-    shutil.rmtree(out_path)
+# Keep the per-host settings of CMakeUserPresets.json
+if os.path.exists("CMakeUserPresets.json"):
+    with open("CMakeUserPresets.json", 'r') as file:
+        vendor = json.load(file).get("vendor", {})
+    if VENDOR_KEY in vendor:
+        files_to_reset["CMakeUserPresets.json"]["vendor"] = {VENDOR_KEY: vendor[VENDOR_KEY]}
+
+# Outside of Windows, configure with GCC or Clang instead of cl.exe
+if os.name != 'nt':
+    files_to_reset["CMakeUserPresets.json"]["configurePresets"] = [
+        create_linux_config(files_to_reset["CMakeUserPresets.json"])
+    ]
+
+# Kept unless explicitly declined, losing them costs a full rebuild
+kept = [name for name in paths_to_keep
+        if input(f"Keep the {name}? (y/n, empty for y): ").strip().lower() != 'n']
+background = input("Delete the old files in the background? (y/n): ").strip().lower() == 'y'
 
-# Delete everything inside specified folders
+# Move out/ and the specified folders into the trash, which is only a rename,
+# then move back what is kept
+trashed_out = move_to_trash(out_path)
+for name, path in paths_to_keep.items():
+    if not path.startswith(out_path):
+        if name not in kept:
+            move_to_trash(path)
+    elif name in kept and trashed_out is not None:
+        restore_from_trash(os.path.join(trashed_out, os.path.relpath(path, out_path)), path)
 for folder in folders_to_clear:
-    if os.path.exists(folder):
-        for filename in os.listdir(folder):
-            file_path = os.path.join(folder, filename)
-            if os.path.isfile(file_path) or os.path.islink(file_path):
-                os.unlink(file_path)
-            elif os.path.isdir(file_path):
-                shutil.rmtree(file_path)
+    if move_to_trash(folder) is not None:
+        os.makedirs(folder)
 
-# Reinitialize JSON files
+# Drop the journal and snapshot so they don't replay over the reset data
+for file_path in files_to_delete:
+    if os.path.exists(file_path):
+        os.remove(file_path)
+
+# Reinitialize JSON files, the presets below once the project data is reset
 for filename, content in files_to_reset.items():
-    file_path = filename
-    with open(file_path, 'w') as json_file:
-        json.dump(content, json_file, indent=4)
+    if filename != "CMakeUserPresets.json":
+        with scaffold_file(filename) as json_file:
+            json.dump(content, json_file, indent=4)
+
+# Size the build parallelism and set up the compiler and vcpkg caches and the
+# linker for this host, now that the project is empty. The caches live outside
+# of out/.
+write_user_presets(files_to_reset["CMakeUserPresets.json"])
+
+# Delete the trash, including what an interrupted reset left in it
+if background:
+    empty_trash_in_background()
+    print(f"Old files are being deleted in the background, see {TRASH_LOG}.")
+else:
+    freed_bytes, freed_files, failures = empty_trash()
+    print(f"Reclaimed {format_size(freed_bytes)} in {freed_files} file(s).")
+    print_failures(failures)
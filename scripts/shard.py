@@ -0,0 +1,181 @@
+""" Split the build into balanced shards respecting the target graph, from the past build durations """
+
+import json
+import os
+import subprocess
+import time
+from build_profile import OBJECT_SUFFIXES, get_finish_times, get_target_deps, read_ninja_log
+from common import BUILD_DIR, get_path_target, get_project, write_if_changed, write_stats
+from presets import get_parallelism, load_user_presets, merge_presets, update_user_presets
+
+CONFIGURATION = "Release"
+# Build trees of the shards run locally, one per shard as on separate agents
+SHARD_BUILD_DIR = "out/shards"
+# Cost of each target at its last build, kept outside of out/ so it survives reset.py
+DURATIONS_PATH = ".cache/build_durations.json"
+# Cost in seconds assumed for a target that was never built, when no target was
+DEFAULT_COST = {"time": 10.0, "compile": 5.0, "link": 1.0}
+
+def read_target_costs(build_dir: str = BUILD_DIR) -> dict[str, dict[str, float]]:
+    """ Read the cost of each target from the whole .ninja_log, in seconds
+
+    Ninja keeps the last entry of every output it ever built, so an
+    incremental build only updates the outputs it rebuilt. "time" sums the
+    jobs of the target, "compile" is its longest compilation and "link" the
+    time of its other steps. Only the outputs of CONFIGURATION count when the
+    tree has several configurations.
+    """
+    outputs = {edge["output"]: (edge["end"] - edge["start"]) / 1000
+               for edge in read_ninja_log(build_dir, all_runs=True)}
+    if any(f"/{CONFIGURATION}/" in f"/{output}" for output in outputs):
+        outputs = {output: duration for output, duration in outputs.items() if f"/{CONFIGURATION}/" in f"/{output}"}
+    costs = {}
+    for output, duration in outputs.items():
+        target = get_path_target(output)
+        if target is None:
+            continue
+        cost = costs.setdefault(target, {"time": 0.0, "compile": 0.0, "link": 0.0})
+        cost["time"] += duration
+        if output.endswith(OBJECT_SUFFIXES):
+            cost["compile"] = max(cost["compile"], duration)
+        else:
+            cost["link"] += duration
+    return costs
+
+def load_costs() -> dict[str, dict[str, float]]:
+    """ Load the stored costs, updated with the build tree ones when it has a .ninja_log """
+    costs = {}
+    if os.path.exists(DURATIONS_PATH):
+        with open(DURATIONS_PATH, 'r') as file:
+            costs = json.load(file)["targets"]
+    if os.path.exists(os.path.join(BUILD_DIR, ".ninja_log")):
+        costs.update(read_target_costs())
+        os.makedirs(os.path.dirname(DURATIONS_PATH), exist_ok=True)
+        write_if_changed(DURATIONS_PATH, json.dumps({"targets": costs}, indent=4) + "\n")
+    return costs
+
+def get_costs(targets: dict[str, list[str]], known: dict[str, dict[str, float]]) -> dict[str, dict[str, float]]:
+    """ Get the cost of every target, the average of the known ones for those never built """
+    known = {target: cost for target, cost in known.items() if target in targets}
+    default = DEFAULT_COST
+    if known:
+        default = {key: sum(cost[key] for cost in known.values()) / len(known) for key in DEFAULT_COST}
+    return {target: known.get(target, default) for target in targets}
+
+def get_closure(targets: dict[str, list[str]], root: str) -> set[str]:
+    """ Get a target and every target it depends on, transitively """
+    closure = set()
+    stack = [root]
+    while stack:
+        target = stack.pop()
+        if target not in closure:
+            closure.add(target)
+            stack.extend(targets.get(target, ()))
+    return closure
+
+def estimate_time(cost: float, finish: float, jobs: int) -> float:
+    """ Estimate the wall time of a build on jobs cores, bounded by its work spread over the cores and its critical path """
+    return max(cost / jobs, finish)
+
+def split_shards(targets: dict[str, list[str]], costs: dict[str, dict[str, float]],
+                 shard_count: int, jobs: int) -> list[dict[str, any]]:
+    """ Split the build into at most shard_count shards of similar time, each one building whole dependency closures
+
+    The roots of the graph, the targets nothing depends on, are placed from
+    the most expensive closure down, each into the shard whose estimated time
+    grows the least, then which builds the least of it already. A shard's
+    critical path is the latest finish time of its roots, as they bring their
+    whole closure along. Shards left without roots are dropped: more agents
+    would only rebuild the same libraries.
+    """
+    finish, _ = get_finish_times(costs, targets)
+    depended = {dep for deps in targets.values() for dep in deps}
+    roots = [target for target in targets if target not in depended]
+    closures = {root: get_closure(targets, root) for root in roots}
+    shards = [{"roots": [], "targets": set(), "cost": 0.0, "finish": 0.0} for _ in range(shard_count)]
+    for root in sorted(roots, key=lambda root: -sum(costs[target]["time"] for target in closures[root])):
+        def placement(shard: dict[str, any]) -> tuple[float, float]:
+            added = sum(costs[target]["time"] for target in closures[root] - shard["targets"])
+            return estimate_time(shard["cost"] + added, max(shard["finish"], finish[root]), jobs), added
+        shard = min(shards, key=placement)
+        shard["cost"] += placement(shard)[1]
+        shard["finish"] = max(shard["finish"], finish[root])
+        shard["targets"] |= closures[root]
+        shard["roots"].append(root)
+    return [shard for shard in shards if shard["roots"]]
+
+def create_shard_presets(shards: list[dict[str, any]]) -> list[dict[str, any]]:
+    """ Create one release build preset per shard, building its roots and so their dependencies """
+    return [
+        {
+            "name": f"shard-{index + 1}-of-{len(shards)}-build",
+            "inherits": "release-build",
+            "targets": sorted(shard["roots"])
+        }
+        for index, shard in enumerate(shards)
+    ]
+
+def format_summary(targets: dict[str, list[str]], costs: dict[str, dict[str, float]],
+                   shards: list[dict[str, any]], jobs: int) -> str:
+    """ Format the expected time of each shard and the makespan against a single agent """
+    lines = [f"{'shard':<22} {'roots':>6} {'targets':>8} {'cost (s)':>10} {'time (s)':>10}"]
+    times = []
+    for index, shard in enumerate(shards):
+        times.append(estimate_time(shard["cost"], shard["finish"], jobs))
+        lines.append(f"{f'shard-{index + 1}-of-{len(shards)}-build':<22} {len(shard['roots']):>6} "
+                     f"{len(shard['targets']):>8} {shard['cost']:>10.1f} {times[-1]:>10.1f}")
+    total = sum(costs[target]["time"] for target in targets)
+    single = estimate_time(total, max(get_finish_times(costs, targets)[0].values(), default=0.0), jobs)
+    makespan = max(times, default=0.0)
+    duplicated = sum(shard["cost"] for shard in shards) - total
+    lines.append(f"Expected makespan {makespan:.1f}s with {jobs} job(s) per agent, "
+                 f"{single:.1f}s on a single agent ({single / max(makespan, 1e-9):.2f}x).")
+    lines.append(f"Duplicated work: {duplicated:.1f}s of {total:.1f}s.")
+    return "\n".join(lines) + "\n"
+
+def run_shards_locally(shards: list[dict[str, any]], jobs: int) -> list[tuple[float, int]]:
+    """ Configure and build each shard in its own tree, all at the same time, returning their wall times and exit codes """
+    processes = []
+    for index, shard in enumerate(shards):
+        build_dir = f"{SHARD_BUILD_DIR}/{index + 1}"
+        command = (f'cmake --preset default-config -B "{build_dir}" && '
+                   f'cmake --build "{build_dir}" --config {CONFIGURATION} -j {jobs} '
+                   f'--target {" ".join(sorted(shard["roots"]))}')
+        log = open(f"{SHARD_BUILD_DIR}/shard-{index + 1}.log", 'w')
+        processes.append((time.perf_counter(), log, subprocess.Popen(command, shell=True, stdout=log,
+                                                                     stderr=subprocess.STDOUT)))
+    results = []
+    for start, log, process in processes:
+        process.wait()
+        results.append((time.perf_counter() - start, process.returncode))
+        log.close()
+    return results
+
+if __name__ == "__main__":
+    project = get_project()
+    targets = get_target_deps(project)
+    known = load_costs()
+    costs = get_costs(targets, known)
+    default_jobs = get_parallelism(load_user_presets())["compile"]
+    shard_count = int(input("Enter the number of shards (empty for none): ") or 0)
+    jobs = int(input(f"Enter the parallel jobs of each agent (empty for {default_jobs}): ") or default_jobs)
+
+    shards = split_shards(targets, costs, shard_count, jobs) if shard_count > 1 else []
+
+    def set_shard_presets(cmake_presets: dict[str, any]) -> None:
+        # Drop the shards of a previous split, their count may differ
+        cmake_presets["buildPresets"] = [preset for preset in cmake_presets.get("buildPresets", [])
+                                         if not preset["name"].startswith("shard-")]
+        cmake_presets["buildPresets"] = merge_presets(cmake_presets["buildPresets"], create_shard_presets(shards))
+    update_user_presets(set_shard_presets)
+    if shards:
+        print(format_summary(targets, costs, shards, jobs), end="")
+        if input("Run the shards locally in parallel? (y/n): ").strip().lower() == 'y':
+            os.makedirs(SHARD_BUILD_DIR, exist_ok=True)
+            # The agents share this host, so do their cores
+            local_jobs = max(1, default_jobs // len(shards))
+            for index, (wall_time, returncode) in enumerate(run_shards_locally(shards, local_jobs)):
+                status = "ok" if returncode == 0 else f"FAILED, see {SHARD_BUILD_DIR}/shard-{index + 1}.log"
+                print(f"shard-{index + 1}-of-{len(shards)}-build: {wall_time:.1f}s with {local_jobs} job(s), {status}")
+    print(f"{len(targets)} target(s), {sum(target in known for target in targets)} with a measured cost.")
+    print(write_stats.summary())
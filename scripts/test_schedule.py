@@ -0,0 +1,130 @@
+""" Schedule the CTest tests from their past durations: costs, parallel jobs and balanced shards """
+
+import heapq
+import json
+import os
+import subprocess
+import xml.etree.ElementTree as ElementTree
+from common import BUILD_DIR, cmake_regex_escape, write_if_changed, write_stats
+from presets import merge_presets, update_user_presets
+
+# JUnit report of the last run, written by the test presets relative to the build directory
+JUNIT_PATH = f"{BUILD_DIR}/test_output.xml"
+# Average duration of each test, kept outside of out/ so it survives reset.py
+DURATIONS_PATH = ".cache/test_durations.json"
+# Number of runs the average duration is taken over, older runs fade out
+DURATION_WINDOW = 10
+# Duration in seconds assumed for a test that never ran
+DEFAULT_DURATION = 1.0
+
+def load_durations() -> dict[str, any]:
+    """ Load the average duration and run count of each test
+
+    "report_mtime" identifies the last JUnit report folded in, so a report is
+    only counted once.
+    """
+    if not os.path.exists(DURATIONS_PATH):
+        return {"report_mtime": None, "tests": {}}
+    with open(DURATIONS_PATH, 'r') as file:
+        return json.load(file)
+
+def read_junit(path: str) -> dict[str, float]:
+    """ Read the duration in seconds of each test that ran in a JUnit report """
+    durations = {}
+    for testcase in ElementTree.parse(path).getroot().iter("testcase"):
+        if testcase.get("status", "run") == "run" and testcase.find("skipped") is None:
+            durations[testcase.get("name")] = float(testcase.get("time", 0))
+    return durations
+
+def update_durations(durations: dict[str, dict[str, float]], report: dict[str, float]) -> None:
+    """ Fold the durations of a run into the moving averages """
+    for name, time in report.items():
+        history = durations.setdefault(name, {"time": time, "runs": 0})
+        history["runs"] = min(history["runs"] + 1, DURATION_WINDOW)
+        history["time"] += (time - history["time"]) / history["runs"]
+
+def list_tests() -> list[str]:
+    """ List the tests known to CTest in the build tree, empty if it isn't configured """
+    try:
+        output = subprocess.run(["ctest", "--test-dir", BUILD_DIR, "-C", "Release", "--show-only=json-v1"],
+                                check=True, capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    return [test["name"] for test in json.loads(output).get("tests", [])]
+
+def get_duration(durations: dict[str, dict[str, float]], name: str) -> float:
+    """ Get the expected duration of a test """
+    return durations[name]["time"] if name in durations else DEFAULT_DURATION
+
+def cmake_quote(text: str) -> str:
+    """ Quote a string as a CMake argument """
+    return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace(';', '\\;') + '"'
+
+def write_test_costs(tests: list[str], durations: dict[str, dict[str, float]]) -> None:
+    """ Write the COST of the tests of each target, read by CTest before running them
+
+    The tests discovered by catch_discover_tests are named "<target>/<test case>".
+    """
+    targets = {}
+    for name in tests:
+        targets.setdefault(name.split("/", 1)[0], []).append(name)
+    os.makedirs(f"{BUILD_DIR}/test_costs", exist_ok=True)
+    for target, names in targets.items():
+        lines = [f"set_tests_properties({cmake_quote(name)} PROPERTIES COST {get_duration(durations, name):.3f})"
+                 for name in sorted(names)]
+        write_if_changed(f"{BUILD_DIR}/test_costs/{target}.cmake", "\n".join(lines) + "\n")
+
+def split_shards(tests: list[str], durations: dict[str, dict[str, float]], shard_count: int) -> list[list[str]]:
+    """ Split the tests into shards of similar total duration, longest tests first """
+    shards = [[] for _ in range(shard_count)]
+    loads = [(0.0, index) for index in range(shard_count)]
+    for name in sorted(tests, key=lambda name: -get_duration(durations, name)):
+        load, index = heapq.heappop(loads)
+        shards[index].append(name)
+        heapq.heappush(loads, (load + get_duration(durations, name), index))
+    return shards
+
+def create_shard_presets(shards: list[list[str]]) -> list[dict[str, any]]:
+    """ Create one release test preset per shard, selecting its tests by name """
+    return [
+        {
+            "name": f"shard-{index + 1}-of-{len(shards)}-test",
+            "inherits": "release-test",
+            "filter": {
+                "include": {
+                    "name": f"^({'|'.join(cmake_regex_escape(name) for name in shard)})$"
+                }
+            }
+        }
+        for index, shard in enumerate(shards) if shard
+    ]
+
+if __name__ == "__main__":
+    history = load_durations()
+    durations = history["tests"]
+    if not os.path.exists(JUNIT_PATH):
+        print(f"No JUnit report at {JUNIT_PATH}, using the stored durations.")
+    elif os.stat(JUNIT_PATH).st_mtime_ns != history["report_mtime"]:
+        update_durations(durations, read_junit(JUNIT_PATH))
+        history["report_mtime"] = os.stat(JUNIT_PATH).st_mtime_ns
+        os.makedirs(os.path.dirname(DURATIONS_PATH), exist_ok=True)
+        write_if_changed(DURATIONS_PATH, json.dumps(history, indent=4) + "\n")
+    tests = list_tests() or list(durations)
+    if os.path.isdir(BUILD_DIR):
+        write_test_costs(tests, durations)
+
+    shard_count = int(input("Enter the number of shards (empty for none): ") or 0)
+    shards = split_shards(tests, durations, shard_count) if shard_count > 1 else []
+
+    def set_shard_presets(cmake_presets: dict[str, any]) -> None:
+        # Drop the shards of a previous split, their count may differ
+        cmake_presets["testPresets"] = [preset for preset in cmake_presets.get("testPresets", [])
+                                        if not preset["name"].startswith("shard-")]
+        if shards:
+            cmake_presets["testPresets"] = merge_presets(cmake_presets["testPresets"], create_shard_presets(shards))
+    update_user_presets(set_shard_presets)
+    for index, shard in enumerate(shards):
+        total = sum(get_duration(durations, name) for name in shard)
+        print(f"shard-{index + 1}-of-{shard_count}-test: {len(shard)} test(s), {total:.2f}s")
+    print(f"{len(tests)} test(s) scheduled from {len(durations)} known duration(s).")
+    print(write_stats.summary())
@@ -0,0 +1,150 @@
+""" Move directories out of the way instantly and delete them in parallel, in the background if needed """
+
+import os
+import stat
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from presets import get_cpu_count
+
+# Trash on the same file system as the project, so moving into it is a rename
+TRASH_DIR = ".trash"
+# Report of the last background deletion
+TRASH_LOG = ".cache/trash.log"
+# Paths listed when some could not be deleted
+FAILURES_SHOWN = 10
+
+def move_to_trash(path: str) -> str | None:
+    """ Rename a file or directory into the trash, returning its new path, None if it doesn't exist """
+    if not os.path.lexists(path):
+        return None
+    os.makedirs(TRASH_DIR, exist_ok=True)
+    trashed = os.path.join(TRASH_DIR, f"{time.time_ns()}-{os.path.basename(os.path.normpath(path))}")
+    os.replace(path, trashed)
+    return trashed
+
+def restore_from_trash(trashed: str, path: str) -> None:
+    """ Move a path back out of the trash, if it was there """
+    if os.path.lexists(trashed):
+        os.makedirs(os.path.dirname(os.path.normpath(path)) or ".", exist_ok=True)
+        os.replace(trashed, path)
+
+def remove_writable(remove: callable, path: str) -> None:
+    """ Remove a path, making it and its directory writable first if it is read-only """
+    try:
+        remove(path)
+    except PermissionError:
+        # Read-only files, on Windows mostly, and read-only directories on POSIX
+        parent = os.path.dirname(path) or "."
+        os.chmod(parent, os.stat(parent).st_mode | stat.S_IWRITE | stat.S_IEXEC)
+        if not os.path.islink(path):
+            os.chmod(path, os.stat(path).st_mode | stat.S_IWRITE | (stat.S_IEXEC if remove is os.rmdir else 0))
+        remove(path)
+
+def delete_tree(path: str, failures: list[str]) -> tuple[int, int]:
+    """ Delete a directory tree with os.scandir, returning the bytes and files freed
+
+    Paths that can't be deleted are added to failures and the rest of the
+    tree is still deleted.
+    """
+    freed_bytes = 0
+    freed_files = 0
+    try:
+        # A read-only directory can't be listed or emptied
+        if not os.access(path, os.R_OK | os.W_OK | os.X_OK):
+            os.chmod(path, os.stat(path).st_mode | stat.S_IREAD | stat.S_IWRITE | stat.S_IEXEC)
+        entries = list(os.scandir(path))
+    except OSError as error:
+        failures.append(f"{path}: {error.strerror}")
+        return 0, 0
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            tree_bytes, tree_files = delete_tree(entry.path, failures)
+            freed_bytes += tree_bytes
+            freed_files += tree_files
+        else:
+            try:
+                size = entry.stat(follow_symlinks=False).st_size
+                remove_writable(os.unlink, entry.path)
+            except OSError as error:
+                failures.append(f"{entry.path}: {error.strerror}")
+                continue
+            freed_bytes += size
+            freed_files += 1
+    try:
+        remove_writable(os.rmdir, path)
+    except OSError as error:
+        # A directory still holding entries that failed was reported through them
+        if not os.path.isdir(path) or not os.listdir(path):
+            failures.append(f"{path}: {error.strerror}")
+    return freed_bytes, freed_files
+
+def delete_entry(path: str) -> tuple[int, int, list[str]]:
+    """ Delete a file or a directory tree, returning the bytes and files freed and the paths that failed """
+    failures = []
+    if os.path.isdir(path) and not os.path.islink(path):
+        freed_bytes, freed_files = delete_tree(path, failures)
+        return freed_bytes, freed_files, failures
+    try:
+        size = os.lstat(path).st_size
+        remove_writable(os.unlink, path)
+    except OSError as error:
+        return 0, 0, [f"{path}: {error.strerror}"]
+    return size, 1, failures
+
+def empty_trash(workers: int | None = None) -> tuple[int, int, list[str]]:
+    """ Delete everything in the trash in parallel, returning the bytes and files freed and the paths that failed
+
+    Each trashed directory is split into its children so that a single large
+    tree, such as out/, still spreads over the workers.
+    """
+    if not os.path.isdir(TRASH_DIR):
+        return 0, 0, []
+    trashed = [entry.path for entry in os.scandir(TRASH_DIR)]
+    paths = []
+    for path in trashed:
+        if os.path.isdir(path) and not os.path.islink(path):
+            paths.extend(child.path for child in os.scandir(path))
+        else:
+            paths.append(path)
+    with ThreadPoolExecutor(max_workers=workers or get_cpu_count()) as executor:
+        results = list(executor.map(delete_entry, paths))
+    # Entries trashed meanwhile by another reset are left for the next run
+    for path in [*trashed, TRASH_DIR]:
+        try:
+            os.rmdir(path)
+        except OSError:
+            pass
+    return (sum(result[0] for result in results), sum(result[1] for result in results),
+            [failure for result in results for failure in result[2]])
+
+def empty_trash_in_background() -> None:
+    """ Empty the trash in a detached process that outlives this one, reporting to TRASH_LOG """
+    options = {"creationflags": subprocess.DETACHED_PROCESS} if os.name == 'nt' else {"start_new_session": True}
+    os.makedirs(os.path.dirname(TRASH_LOG), exist_ok=True)
+    with open(TRASH_LOG, 'w') as log:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__)], stdin=subprocess.DEVNULL,
+                         stdout=log, stderr=subprocess.STDOUT, **options)
+
+def format_size(size: int) -> str:
+    """ Format a byte count with a binary unit """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TiB"
+
+def print_failures(failures: list[str]) -> None:
+    """ Report the paths the trash could not delete """
+    if failures:
+        print(f"Could not delete {len(failures)} path(s), left in {TRASH_DIR}:")
+        for failure in failures[:FAILURES_SHOWN]:
+            print(f"  {failure}")
+        if len(failures) > FAILURES_SHOWN:
+            print(f"  ... and {len(failures) - FAILURES_SHOWN} more")
+
+if __name__ == "__main__":
+    freed_bytes, freed_files, failures = empty_trash()
+    print(f"Reclaimed {format_size(freed_bytes)} in {freed_files} file(s).")
+    print_failures(failures)
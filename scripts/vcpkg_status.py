@@ -0,0 +1,60 @@
+""" Report the size of the vcpkg binary cache and what the last configure restored or built """
+
+import json
+import os
+import re
+from presets import VCPKG_BINARY_CACHE_DIR, VENDOR_KEY
+from trash import format_size
+
+# Output of the vcpkg manifest install run by the toolchain file during the configure
+INSTALL_LOG = "out/build/vcpkg-manifest-install.log"
+RESTORED_PATTERN = re.compile(r"^Restored (\d+) package")
+BUILDING_PATTERN = re.compile(r"^Building (\S+?)(?:@\S*)?\.\.\.$")
+
+def get_cache_size(cache_dir: str) -> dict[str, tuple[int, int]]:
+    """ Get the number of packages and bytes of each triplet of the cache """
+    sizes = {}
+    if not os.path.isdir(cache_dir):
+        return sizes
+    for triplet in sorted(os.listdir(cache_dir)):
+        package_count = 0
+        total_bytes = 0
+        for dir_path, _, file_names in os.walk(os.path.join(cache_dir, triplet)):
+            for file_name in file_names:
+                package_count += file_name.endswith(".zip")
+                total_bytes += os.path.getsize(os.path.join(dir_path, file_name))
+        sizes[triplet] = (package_count, total_bytes)
+    return sizes
+
+def read_install_log(path: str) -> tuple[int, list[str]]:
+    """ Read the number of packages restored from the cache and the packages built from source """
+    restored = 0
+    built = []
+    with open(path, 'r', errors='replace') as file:
+        for line in file:
+            line = line.strip()
+            if match := RESTORED_PATTERN.match(line):
+                restored += int(match.group(1))
+            elif match := BUILDING_PATTERN.match(line):
+                built.append(match.group(1))
+    return restored, built
+
+if __name__ == "__main__":
+    with open("CMakeUserPresets.json", 'r') as file:
+        overrides = json.load(file).get("vendor", {}).get(VENDOR_KEY, {})
+    cache_dir = overrides.get("vcpkg_binary_cache", VCPKG_BINARY_CACHE_DIR)
+    if cache_dir == "none":
+        print("The vcpkg binary cache is disabled.")
+    else:
+        sizes = get_cache_size(cache_dir)
+        for triplet, (package_count, total_bytes) in sizes.items():
+            print(f"{triplet:<24} {package_count:>5} package(s) {format_size(total_bytes):>12}")
+        print(f"{'total':<24} {sum(size[0] for size in sizes.values()):>5} package(s) "
+              f"{format_size(sum(size[1] for size in sizes.values())):>12} in {cache_dir}")
+    if os.path.exists(INSTALL_LOG):
+        restored, built = read_install_log(INSTALL_LOG)
+        print(f"Last configure: {restored} package(s) restored, {len(built)} built from source.")
+        for package in built:
+            print(f"  built {package}")
+    else:
+        print(f"No vcpkg install log at {INSTALL_LOG}, configure the project first.")
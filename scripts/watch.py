@@ -0,0 +1,270 @@
+""" Watch the project and rebuild the targets affected by each change, regenerating their configs first """
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import subprocess
+import sys
+import time
+from app_config import set_build_config_and_packaging as set_app_build_config
+from app_create import write_app_cmake_files
+from common import BUILD_DIR, ProjectModel, get_project
+from impact import get_impact, get_impact_targets
+from lib_config import set_build_config_and_packaging as set_lib_build_config
+from lib_create import write_lib_cmake_files
+
+# Directories watched recursively
+WATCHED_DIRS = ["json", "src", "include", "tests", "apps", "bench"]
+# Files of json/ that hold the project data, the others are written by the scripts
+PROJECT_DATA_FILES = ["json/project_data.json", "json/project_data.journal"]
+# Generated files whose changes are the consequence of a handled event
+GENERATED_NAMES = ["CMakeLists.txt"]
+# Change reported when events were lost, the top-level CMakeLists.txt affects every target
+OVERFLOW_PATH = "CMakeLists.txt"
+# Quiet time, in seconds, closing a burst of events such as a save or a checkout
+DEBOUNCE_S = 0.3
+# Interval, in seconds, between two scans of the polling watcher
+POLL_INTERVAL_S = 0.5
+
+# inotify(7) event masks
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")
+
+def is_ignored(path: str) -> bool:
+    """ Check if a path is an editor or tool artifact rather than a project file """
+    name = os.path.basename(path)
+    if path.startswith("json/"):
+        return path not in PROJECT_DATA_FILES
+    return (name.startswith('.') or name.endswith(('~', '.swp', '.tmp')) or name in GENERATED_NAMES
+            or "__pycache__" in path)
+
+def merge_change(changes: dict[str, str], path: str, kind: str) -> None:
+    """ Record a "created", "modified" or "deleted" event, merged with the earlier one of the path """
+    if is_ignored(path):
+        return
+    previous = changes.get(path)
+    if previous == "created" and kind == "modified":
+        return
+    if previous == "created" and kind == "deleted":
+        del changes[path]
+    elif previous == "deleted" and kind == "created":
+        changes[path] = "modified"
+    else:
+        changes[path] = kind
+
+class InotifyWatcher:
+    """ Watch directory trees with Linux inotify through ctypes """
+
+    name = "inotify"
+
+    def __init__(self, roots: list[str]) -> None:
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs: dict[int, str] = {}
+        for root in roots:
+            if os.path.isdir(root):
+                self._add_tree(root)
+
+    def _add_tree(self, root: str, changes: dict[str, str] | None = None) -> None:
+        """ Watch a directory and its subdirectories, recording their files as created if asked """
+        for dir_path, dir_names, file_names in os.walk(root):
+            dir_names[:] = [name for name in dir_names if not is_ignored(os.path.join(dir_path, name))]
+            watch = self._libc.inotify_add_watch(self._fd, os.fsencode(dir_path), WATCH_MASK)
+            if watch < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch failed on {dir_path}, "
+                              "raise fs.inotify.max_user_watches")
+            self._dirs[watch] = dir_path.replace(os.sep, "/")
+            if changes is not None:
+                for file_name in file_names:
+                    merge_change(changes, f"{self._dirs[watch]}/{file_name}", "created")
+
+    def wait(self, timeout: float | None) -> dict[str, str]:
+        """ Wait up to timeout seconds, forever if None, and return the changed paths with their kind
+
+        A queue overflow, after which events are lost, is reported as a change
+        of OVERFLOW_PATH.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changes = {}
+        # Events of ignored paths don't count, the wait goes on until a real change or the deadline
+        while not changes:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            if select.select([self._fd], [], [], remaining)[0]:
+                self._read_events(changes)
+        return changes
+
+    def _read_events(self, changes: dict[str, str]) -> None:
+        """ Read the pending events into changes """
+        try:
+            buffer = os.read(self._fd, 1 << 16)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(buffer):
+            watch, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                changes[OVERFLOW_PATH] = "modified"
+                continue
+            if watch not in self._dirs:
+                continue
+            path = f"{self._dirs[watch]}/{os.fsdecode(name)}"
+            if mask & IN_ISDIR:
+                # Files written before the watch was added are picked up by the walk
+                if mask & (IN_CREATE | IN_MOVED_TO) and not is_ignored(path):
+                    self._add_tree(path, changes)
+            elif mask & (IN_CREATE | IN_MOVED_TO):
+                merge_change(changes, path, "created")
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                merge_change(changes, path, "deleted")
+            else:
+                merge_change(changes, path, "modified")
+
+class PollingWatcher:
+    """ Watch directory trees by comparing the sizes and modification times of their files """
+
+    name = "polling"
+
+    def __init__(self, roots: list[str]) -> None:
+        self._roots = roots
+        self._files = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """ Get the size and modification time of every watched file """
+        files = {}
+        for root in self._roots:
+            for dir_path, dir_names, file_names in os.walk(root):
+                dir_names[:] = [name for name in dir_names if not is_ignored(os.path.join(dir_path, name))]
+                for file_name in file_names:
+                    path = os.path.join(dir_path, file_name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    files[path.replace(os.sep, "/")] = (stat.st_size, stat.st_mtime_ns)
+        return files
+
+    def wait(self, timeout: float | None) -> dict[str, str]:
+        """ Scan until something changed or timeout seconds passed, forever if None """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            files = self._scan()
+            changes = {}
+            for path, key in files.items():
+                if path not in self._files:
+                    merge_change(changes, path, "created")
+                elif self._files[path] != key:
+                    merge_change(changes, path, "modified")
+            for path in self._files.keys() - files.keys():
+                merge_change(changes, path, "deleted")
+            self._files = files
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+            remaining = POLL_INTERVAL_S if deadline is None else deadline - time.monotonic()
+            time.sleep(max(0.0, min(POLL_INTERVAL_S, remaining)))
+
+def create_watcher(roots: list[str]) -> InotifyWatcher | PollingWatcher:
+    """ Watch with inotify on Linux, by polling elsewhere or when inotify is unavailable """
+    if sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots)
+
+def wait_for_changes(watcher: InotifyWatcher | PollingWatcher) -> dict[str, str]:
+    """ Wait for a change, then collect the following ones until DEBOUNCE_S passes without any """
+    changes = {}
+    while not changes:
+        changes = watcher.wait(None)
+    while True:
+        more = watcher.wait(DEBOUNCE_S)
+        if not more:
+            return changes
+        for path, kind in more.items():
+            merge_change(changes, path, kind)
+
+def get_project_state(project: ProjectModel) -> dict[str, dict[str, any]]:
+    """ Get the settings of every library and app, to find the ones a project data change touched """
+    return {
+        "libs": {lib: project.get_lib_data(lib) for lib in project.libs},
+        "apps": {app: (project.get_app_libs(app), project.get_app_data(app)) for app in project.apps}
+    }
+
+def regenerate_configs(project: ProjectModel, previous: dict[str, dict[str, any]]) -> list[str]:
+    """ Regenerate the CMake files and presets of the libraries and apps whose settings changed
+
+    Returns paths standing for the changed libraries and apps, to compute the
+    targets to build.
+    """
+    current = get_project_state(project)
+    libs = [lib for lib, data in current["libs"].items() if previous["libs"].get(lib) != data]
+    apps = [app for app, data in current["apps"].items() if previous["apps"].get(app) != data]
+    for lib in libs:
+        write_lib_cmake_files(lib, current["libs"][lib])
+        set_lib_build_config(lib)
+    for app in apps:
+        app_libs, app_data = current["apps"][app]
+        write_app_cmake_files(app, app_libs, app_data)
+    if apps:
+        set_app_build_config(apps)
+    project.write_manifest()
+    return [f"src/{lib}/CMakeLists.txt" for lib in libs] + [f"apps/{app}/CMakeLists.txt" for app in apps]
+
+def touch_source_lists(changes: dict[str, str]) -> None:
+    """ Touch the CMakeLists.txt of the directories where sources were added or removed
+
+    AUX_SOURCE_DIRECTORY lists the sources at configure time, the touch makes
+    the next build re-run CMake.
+    """
+    for path, kind in changes.items():
+        cmake_path = os.path.join(os.path.dirname(path), "CMakeLists.txt")
+        if kind != "modified" and os.path.exists(cmake_path):
+            os.utime(cmake_path)
+
+def build_targets(targets: list[str], configuration: str) -> bool:
+    """ Build targets with Ninja, configuring the build tree first if needed """
+    if not os.path.exists(f"{BUILD_DIR}/CMakeCache.txt"):
+        if subprocess.run(["cmake", "--preset", "default-config"]).returncode != 0:
+            return False
+    return subprocess.run(["cmake", "--build", BUILD_DIR, "--config", configuration,
+                           "--target", *targets]).returncode == 0
+
+if __name__ == "__main__":
+    configuration = input("Enter the configuration to build (empty for Debug): ").strip() or "Debug"
+    project = get_project()
+    state = get_project_state(project)
+    watcher = create_watcher(WATCHED_DIRS)
+    print(f"Watching {', '.join(WATCHED_DIRS)} with {watcher.name}, Ctrl+C to stop.")
+    try:
+        while True:
+            changes = wait_for_changes(watcher)
+            paths = [path for path in changes if path not in PROJECT_DATA_FILES]
+            if any(path in PROJECT_DATA_FILES for path in changes) and project.refresh():
+                paths += regenerate_configs(project, state)
+                state = get_project_state(project)
+            touch_source_lists(changes)
+            targets = get_impact_targets(get_impact(project, paths))
+            if not targets:
+                continue
+            print(f"{len(changes)} change(s), building {len(targets)} target(s): {' '.join(targets[:8])}"
+                  f"{' ...' if len(targets) > 8 else ''}")
+            succeeded = build_targets(targets, configuration)
+            print(f"Build {'succeeded' if succeeded else 'FAILED'}.")
+    except KeyboardInterrupt:
+        print("Stopped watching.")